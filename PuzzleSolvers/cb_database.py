@@ -0,0 +1,182 @@
+""" ---------------------------------------------------------------------------
+    File: cb_database.py
+    Author: Kyle Walker
+    Purpose: This program builds a database of every state of a small peg
+             solitaire board, so cb_solver.py can answer cb_one by looking
+             moves up instead of searching. The 15-hole triangle has only
+             2^15 states, and they are worked through backwards: a move
+             always takes one peg off, so going through the boards from the
+             fewest pegs to the most, every board after a move has already
+             been solved when it is needed.
+
+             The database has two bytes for each bitboard, at 2 * bits: the
+             fewest pegs that can be left from it (1 when it can be solved),
+             and the number in geometry.moves of the best move, or NO_MOVE
+             when there is none. The best move is the first one in move order
+             that leaves the fewest pegs, which is the move cb_one would
+             pick. The file is memory-mapped when it is loaded, so it is
+             shared between processes and not read until it is used. It
+             starts with DATABASE_MAGIC and a hash of the moves of the
+             geometry, and a file whose moves do not match is not used.
+
+    Usage:
+        python cb_database.py
+        python cb_database.py --board triangle6 --out triangle6.pegdb
+
+        The file goes next to this program by default, where cb_solver.py
+        looks for it.
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import sys
+
+from cb_geometry import TRIANGLE, get_geometry
+
+# Move number stored for boards with no moves left.
+NO_MOVE = 255
+# Largest board a database is built for; the database has 2^holes entries.
+DATABASE_LIMIT = 21
+# Start of every database file, before the hash from moves_hash.
+DATABASE_MAGIC = b"PEGDB\x00\x00\x01"
+HEADER_SIZE = len(DATABASE_MAGIC) + hashlib.sha256().digest_size
+
+def database_path(geometry=TRIANGLE):
+    '''
+        This function returns where the database of a geometry is kept by
+        default: a file named after it next to this program.
+    '''
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        geometry.name + ".pegdb")
+
+def moves_hash(geometry=TRIANGLE):
+    '''
+        This function returns a hash of the moves of a geometry, in order,
+        since the database stores each move by its number.
+    '''
+    return hashlib.sha256(repr(geometry.moves).encode("ascii")).digest()
+
+def build_database(geometry=TRIANGLE):
+    '''
+        This function works out the fewest pegs that can be left and the
+        best move for every bitboard of the geometry.
+        Arguments:
+            geometry: the shape of the board
+        Return Values:
+            database: bytearray of two bytes for each bitboard, as described
+            at the top of this file
+        Pre-conditions: geometry.size must be at most DATABASE_LIMIT
+    '''
+    database = bytearray(2 << geometry.size)
+    masks = list(enumerate(geometry.move_masks))
+    for bits in sorted(range(1 << geometry.size), key=int.bit_count):
+        fewest = bits.bit_count()
+        best = NO_MOVE
+        for number, (pegs, hole, flip) in masks:
+            if bits & pegs == pegs and not bits & hole:
+                left = database[2 * (bits ^ flip)]
+                if left < fewest:
+                    fewest = left
+                    best = number
+        database[2 * bits] = fewest
+        database[2 * bits + 1] = best
+    return database
+
+def write_database(database, file_name, geometry=TRIANGLE):
+    '''
+        This function saves a database after its header, writing it to a
+        temporary file first so a reader never sees half of it.
+    '''
+    temp_name = file_name + ".tmp"
+    with open(temp_name, "wb") as file:
+        file.write(DATABASE_MAGIC + moves_hash(geometry))
+        file.write(database)
+    os.replace(temp_name, file_name)
+
+def load_database(geometry=TRIANGLE, file_name=None):
+    '''
+        This function memory-maps the database of a geometry.
+        Arguments:
+            geometry: the shape of the board
+            file_name: the database file, database_path(geometry) if None
+        Return Values:
+            database: read-only view of the mapped file after its header, or
+            None when the file is missing, is not the size of a database
+            for the geometry, or was built for other moves
+        Pre-conditions: None
+    '''
+    if file_name is None:
+        file_name = database_path(geometry)
+    try:
+        with open(file_name, "rb") as file:
+            if os.fstat(file.fileno()).st_size != \
+               HEADER_SIZE + (2 << geometry.size):
+                return None
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+    if mapped[:HEADER_SIZE] != DATABASE_MAGIC + moves_hash(geometry):
+        mapped.close()
+        return None
+    return memoryview(mapped)[HEADER_SIZE:]
+
+def lookup_one(database, bits, geometry=TRIANGLE):
+    '''
+        This function finds the solution cb_one would give by following the
+        best moves of the database, taking one look up per move.
+        Arguments:
+            database: the database of the geometry
+            bits: the bitboard
+            geometry: the shape of the board
+        Return Values:
+            moves: the list of moves that leaves one peg, [] if bits already
+            has one peg, or None when the board can not be solved
+        Pre-conditions: bits must be a bitboard of the geometry
+    '''
+    if database[2 * bits] != 1:
+        return None
+    moves = []
+    while bits.bit_count() > 1:
+        number = database[2 * bits + 1]
+        moves.append(geometry.moves[number])
+        bits ^= geometry.move_masks[number][2]
+    return moves
+
+def main(argv):
+    '''
+        This function reads the command line options and builds and saves
+        the database.
+        Arguments:
+            argv: list of command line arguments
+        Return Values:
+            None
+        Pre-conditions: None
+    '''
+    parser = argparse.ArgumentParser(
+        description="Build the database of every state of a peg solitaire "
+                    "board.")
+    parser.add_argument("--board", default="triangle",
+                        help="triangle or triangleN, with at most " +
+                             str(DATABASE_LIMIT) + " holes")
+    parser.add_argument("--out", help="file to write, next to this program "
+                                      "by default")
+    args = parser.parse_args(argv)
+    try:
+        geometry = get_geometry(args.board)
+    except ValueError as error:
+        parser.error(str(error))
+    if geometry.size > DATABASE_LIMIT:
+        parser.error(args.board + " has " + str(geometry.size) +
+                     " holes, more than " + str(DATABASE_LIMIT))
+
+    database = build_database(geometry)
+    file_name = args.out or database_path(geometry)
+    write_database(database, file_name, geometry)
+    solvable = sum([1 for bits in range(1 << geometry.size)
+                    if database[2 * bits] == 1])
+    print("wrote " + file_name + ": " + str(1 << geometry.size) +
+          " states, " + str(solvable) + " solvable")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,208 @@
+""" ---------------------------------------------------------------------------
+    File: cb_geometry.py
+    Author: Kyle Walker
+    Purpose: This module describes the shapes of peg solitaire boards for
+             cb_solver.py. A geometry lists the holes of a board, every move
+             that can be made on it, its symmetries and how to draw it, all
+             worked out from the coordinates of the holes instead of being
+             typed in. There are triangular boards of any size, like the
+             15-hole "Cracker Barrel" board, and the 33-hole English and
+             37-hole European cross boards.
+
+             A board is a string with one "1" (peg) or "0" (empty) for each
+             hole, in the order of Geometry.holes: top to bottom and left to
+             right.
+
+"""
+
+class Geometry:
+    '''
+        The shape of a peg solitaire board.
+        Attributes:
+            name: name of the board
+            holes: list of the (row, col) of every hole, top to bottom and
+                left to right; hole i is character i of a board string
+            size: number of holes
+            moves: sorted tuple of every (start, skip, end) jump
+            move_masks: for each move, the bitboard mask of the two holes
+                that need pegs, of the hole that must be empty, and of all
+                three holes the jump flips
+            symmetries: list of the hole each hole moves to under each
+                rotation and reflection of the board, the first being the
+                identity
+            symmetry_tables: byte lookup tables applying each symmetry to a
+                bitboard, from symmetry_tables
+            start_hole: the hole left empty at the usual start
+            solvable: transposition table of whether the canonical form of
+                a board can be solved down to one peg
+            solution_counts: number of solutions of the canonical form of a
+                board
+    '''
+    def __init__(self, name, holes, directions, symmetries, render,
+                 start_hole=0):
+        '''
+            Arguments:
+                name: name of the board
+                holes: list of (row, col) of every hole, in board order
+                directions: (row step, col step) of each way a peg can jump
+                symmetries: list of functions, each mapping a (row, col) to
+                    where it moves under one symmetry
+                render: function turning a board string into lines of text
+                start_hole: the hole left empty at the usual start
+        '''
+        self.name = name
+        self.holes = holes
+        self.size = len(holes)
+        index = {hole: number for number, hole in enumerate(holes)}
+        moves = []
+        for start, (row, col) in enumerate(holes):
+            for step_row, step_col in directions:
+                skip = index.get((row + step_row, col + step_col))
+                end = index.get((row + 2 * step_row, col + 2 * step_col))
+                if skip is not None and end is not None:
+                    moves.append((start, skip, end))
+        self.moves = tuple(sorted(moves))
+        self.move_masks = tuple([((1 << start) | (1 << skip), 1 << end,
+                                  (1 << start) | (1 << skip) | (1 << end))
+                                 for start, skip, end in self.moves])
+        self.symmetries = [[index[symmetry(hole)] for hole in holes]
+                           for symmetry in symmetries]
+        self.symmetry_tables = symmetry_tables(self.symmetries)
+        self.render = render
+        self.start_hole = start_hole
+        self.solvable = {}
+        self.solution_counts = {}
+
+    def __repr__(self):
+        return "<Geometry " + self.name + ">"
+
+def symmetry_tables(symmetries):
+    '''
+        This function builds lookup tables that apply each symmetry to a
+        bitboard a byte at a time, instead of a bit at a time.
+        Arguments:
+            symmetries: list of lists giving the hole every hole moves to
+        Return Values:
+            tables: list with a list of byte tables for each symmetry, where
+            entry v of table k is the bitboard v << (8 * k) is moved to
+        Pre-conditions: None
+    '''
+    tables = []
+    for moved in symmetries:
+        byte_tables = []
+        for low in range(0, len(moved), 8):
+            table = []
+            for value in range(256):
+                bits = 0
+                for hole in range(low, min(low + 8, len(moved))):
+                    if value >> (hole - low) & 1:
+                        bits |= 1 << moved[hole]
+                table.append(bits)
+            byte_tables.append(table)
+        tables.append(byte_tables)
+    return tables
+
+def triangle(side):
+    '''
+        This function makes a triangular board with side holes along each
+        edge. Row r has r + 1 holes, and a peg jumps along a row or along
+        either slope. The six symmetries swap around the distances
+        (r - c, c, side - 1 - r) from a hole to the three edges.
+        Arguments:
+            side: number of holes along each edge, at least 1
+        Return Values:
+            geometry: the Geometry of the board
+        Pre-conditions: None
+    '''
+    holes = [(row, col) for row in range(side) for col in range(row + 1)]
+    symmetries = []
+    for order in ((0, 1, 2), (1, 2, 0), (2, 0, 1),
+                  (1, 0, 2), (0, 2, 1), (2, 1, 0)):
+        def symmetry(hole, order=order):
+            row, col = hole
+            distances = (row - col, col, side - 1 - row)
+            return (side - 1 - distances[order[2]], distances[order[1]])
+        symmetries.append(symmetry)
+
+    def render(board):
+        lines = []
+        first = 0
+        for row in range(side):
+            lines.append(" " * (side - 1 - row) +
+                         " ".join(board[first:first + row + 1]))
+            first += row + 1
+        return lines
+
+    return Geometry("triangle" + str(side), holes,
+                    ((0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, -1)),
+                    symmetries, render)
+
+def cross(corners=False):
+    '''
+        This function makes a cross shaped board on a 7 by 7 grid: the
+        33-hole English board, or with corners the 37-hole European board,
+        which has an extra hole inside each corner of the cross. Pegs jump
+        along rows and columns, and the board has the eight symmetries of a
+        square.
+        Arguments:
+            corners: True for the European board
+        Return Values:
+            geometry: the Geometry of the board
+        Pre-conditions: None
+    '''
+    extra = ((1, 1), (1, 5), (5, 1), (5, 5)) if corners else ()
+    holes = [(row, col) for row in range(7) for col in range(7)
+             if 2 <= row <= 4 or 2 <= col <= 4 or (row, col) in extra]
+    symmetries = [lambda hole: hole,
+                  lambda hole: (hole[1], 6 - hole[0]),
+                  lambda hole: (6 - hole[0], 6 - hole[1]),
+                  lambda hole: (6 - hole[1], hole[0]),
+                  lambda hole: (hole[0], 6 - hole[1]),
+                  lambda hole: (6 - hole[0], hole[1]),
+                  lambda hole: (hole[1], hole[0]),
+                  lambda hole: (6 - hole[1], 6 - hole[0])]
+
+    def render(board):
+        cells = dict(zip(holes, board))
+        return [" ".join([cells.get((row, col), " ") for col in range(7)])
+                .rstrip() for row in range(7)]
+
+    return Geometry("european" if corners else "english", holes,
+                    ((0, 1), (0, -1), (1, 0), (-1, 0)), symmetries, render,
+                    holes.index((3, 3)))
+
+def start_board(geometry, hole=None):
+    '''
+        This function makes the usual starting board: every hole has a peg
+        except one.
+        Arguments:
+            geometry: the Geometry of the board
+            hole: number of the empty hole, geometry.start_hole if None
+        Return Values:
+            board: the board string
+        Pre-conditions: None
+    '''
+    if hole is None:
+        hole = geometry.start_hole
+    return "1" * hole + "0" + "1" * (geometry.size - hole - 1)
+
+TRIANGLE = triangle(5)
+ENGLISH = cross()
+EUROPEAN = cross(corners=True)
+# Boards that can be picked by name. Other triangles are added when they
+# are first asked for, so each keeps its tables.
+GEOMETRIES = {"triangle": TRIANGLE, TRIANGLE.name: TRIANGLE,
+              "english": ENGLISH, "european": EUROPEAN}
+
+def get_geometry(name):
+    '''
+        This function finds a board by name: one of GEOMETRIES, or
+        "triangleN" for a triangle with N holes along each edge. The name
+        of every geometry finds it again.
+    '''
+    if name in GEOMETRIES:
+        return GEOMETRIES[name]
+    if name.startswith("triangle") and name[8:].isdigit():
+        GEOMETRIES[name] = triangle(int(name[8:]))
+        return GEOMETRIES[name]
+    raise ValueError("unknown board: " + name)
@@ -8,11 +8,50 @@
              current board. There is a cb_one function that gives one possible
              solution of the many possible, and there is a cb_all function
              which gives every possible set of moves to solve the board with
-             only one "peg" remaining.
+             only one "peg" remaining. cb_solutions gives the same solutions
+             one at a time, and cb_count counts them without making them.
+
+             The solvers work on bitboards: a board is an int where bit i is
+             set when hole i has a peg, each move is a precomputed set of
+             masks, and pegs are counted with int.bit_count. Boards are
+             still passed in and printed as strings. Whether a board can be
+             solved is remembered in a transposition table, keyed on the
+             board turned and flipped into a canonical form, so boards that
+             are rotations or mirror images of each other are only searched
+             once and dead ends are cut off straight away.
+
+             Every function takes the shape of the board as an optional
+             geometry from cb_geometry.py, so the same solvers work on
+             triangles of any size and on the English and European cross
+             boards. The default is the 15-hole triangle.
+
+             Run as a program, it solves every start with one empty hole on
+             a pool of worker processes and prints a table of the number of
+             solutions, the first solution and the time taken for each.
+
+             When cb_database.py has built the database of the 15-hole
+             triangle, it is memory-mapped here and cb_one looks its moves
+             up instead of searching.
+
+    Usage:
+        python cb_solver.py --board triangle6 --workers 4 --tasks
+        python cb_solver.py --split subtree --workers 2
 
 """
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cb_database import load_database, lookup_one
+from cb_geometry import TRIANGLE, get_geometry, start_board
 
-def print_board(board):
+# Database of every state of the 15-hole triangle, or None if it has not
+# been built.
+DATABASE = load_database(TRIANGLE)
+
+def print_board(board, geometry=TRIANGLE):
     '''
         This function prints the contents of the board as a more easily
             recognizable pyramid shaped board. The empty spots are shown as
@@ -21,79 +60,130 @@ def print_board(board):
             board: The string representing the pegs on the board. This is
                 15 characters long, going from top to bottom and left to right
                 on the board as an encoded string.
+            geometry: the shape of the board, which draws it
         Return Values:
             None
-        Pre-conditions: board must be a string of 15 characters
+        Pre-conditions: board must be a string of geometry.size characters
     '''
-    print("    " + board[0])
-    print("   " + board[1] + " " + board[2])
-    print("  " + board[3] + " " + board[4] + " " + board[5])
-    print(" " + board[6] + " " + board[7] + " " + board[8] + " " + board[9])
-    print(board[10] + " " + board[11] + " " +
-          board[12] + " " + board[13] + " " + board[14])
+    for line in geometry.render(board):
+        print(line)
 
-def get_all_conceivable_moves():
+def get_all_conceivable_moves(geometry=TRIANGLE):
     '''
-        This function returns a hardcoded set of all concievable moves on the
-        board.
+        This function returns the set of all concievable moves on the board.
             Because the shape of the board is not applicable to a linear
             string, these tuples show the possible moves that can be made
-            from each peg.
+            from each peg. They are worked out by the geometry.
         Arguments:
-            None
+            geometry: the shape of the board
         Return Values:
-            all_moves: The set of all hardcoded tuples, representing all
-            possible moves
+            all_moves: The set of all tuples, representing all possible moves
                 at all pegs.
         Pre-conditions: None
     '''
-    all_moves = set([(0, 1, 3), (0, 2, 5),
-                    (1, 3, 6), (1, 4, 8),
-                    (2, 4, 7), (2, 5, 9),
-                    (3, 1, 0), (3, 4, 5), (3, 6, 10), (3, 7, 12),
-                    (4, 7, 11), (4, 8, 13),
-                    (5, 2, 0), (5, 9, 14), (5, 8, 12), (5, 4, 3),
-                    (6, 3, 1), (6, 7, 8),
-                    (7, 4, 2), (7, 8, 9),
-                    (8, 7, 6), (8, 4, 1),
-                    (9, 8, 7), (9, 5, 2),
-                    (10, 6, 3), (10, 11, 12),
-                    (11, 7, 4), (11, 12, 13),
-                    (12, 11, 10), (12, 7, 3), (12, 8, 5), (12, 13, 14),
-                    (13, 12, 11), (13, 8, 4),
-                    (14, 13, 12), (14, 9, 5)])
-    return all_moves
-
-def get_moves(board):
+    return set(geometry.moves)
+
+def canonical_board(bits, geometry=TRIANGLE):
+    '''
+        This function turns a bitboard into the smallest of the bitboards of
+        all its rotations and mirror images, which is the same for every
+        board in the group.
+    '''
+    best = None
+    for tables in geometry.symmetry_tables:
+        moved = 0
+        rest = bits
+        for table in tables:
+            moved |= table[rest & 255]
+            rest >>= 8
+        if best is None or moved < best:
+            best = moved
+    return best
+
+def is_solvable(bits, geometry=TRIANGLE):
+    '''
+        This function finds whether a bitboard can be solved down to one
+        peg, using and filling the transposition table of the geometry.
+        Arguments:
+            bits: the bitboard
+            geometry: the shape of the board
+        Return Values:
+            True if some sequence of moves leaves one peg
+        Pre-conditions: None
+    '''
+    if bits.bit_count() == 1:
+        return True
+    key = canonical_board(bits, geometry)
+    solvable = geometry.solvable.get(key)
+    if solvable is None:
+        solvable = False
+        for _, new_bits in next_boards(bits, geometry):
+            if is_solvable(new_bits, geometry):
+                solvable = True
+                break
+        geometry.solvable[key] = solvable
+    return solvable
+
+def board_to_bits(board):
+    '''
+        This function turns a board string into a bitboard.
+        Arguments:
+            board: The string (or list of characters) representing the pegs
+                on the board.
+        Return Values:
+            bits: int with bit i set when board[i] is "1"
+        Pre-conditions: board must contain only "1" and "0"
+    '''
+    return int("".join(board)[::-1], 2)
+
+def bits_to_board(bits, geometry=TRIANGLE):
+    '''
+        This function turns a bitboard back into a board string.
+        Arguments:
+            bits: int with bit i set when hole i has a peg
+            geometry: the shape of the board
+        Return Values:
+            board: the board string, geometry.size characters long
+        Pre-conditions: None
+    '''
+    return format(bits, "0" + str(geometry.size) + "b")[::-1]
+
+def next_boards(bits, geometry=TRIANGLE):
+    '''
+        This function finds every legal move on a bitboard, checking each of
+        the conceivable moves once.
+        Arguments:
+            bits: the bitboard
+            geometry: the shape of the board
+        Return Values:
+            next_list: list of (move, bitboard after the move) pairs, in the
+            order of geometry.moves
+        Pre-conditions: None
+    '''
+    return [(move, bits ^ flip)
+            for move, (pegs, hole, flip) in zip(geometry.moves,
+                                                 geometry.move_masks)
+            if bits & pegs == pegs and not bits & hole]
+
+def get_moves(board, geometry=TRIANGLE):
     '''
         This function returns all possible moves based on the current board.
-        It refers to the all_moves set to check if the moves follow the
-        rules of the game and shape of the board.
+        It refers to the moves of the geometry to check if the moves follow
+        the rules of the game and shape of the board.
         Arguments:
             board: The string representing the pegs on the board. This is
                 15 characters long, going from top to bottom and left to right
                 on the board as an encoded string.
+            geometry: the shape of the board
         Return Values:
             possible_moveset: a sorted set of all possible moves at the current
             board.
-        Pre-conditions: board must be 15 char string containing only "1" and
-        "0"
-    '''
-    all_moves = get_all_conceivable_moves()
-    possible_moveset = set()
-    for peg in range(0, 15):
-        for move in all_moves:
-            start = move[0]
-            skip = move[1]
-            end = move[2]
-            if peg == start:
-                if board[peg] == "1" and board[skip] == "1" and \
-                   board[end] == "0":
-                    possible_move = (start, skip, end)
-                    possible_moveset.add(possible_move)
-    return sorted(possible_moveset)
-
-def cb_one(board):
+        Pre-conditions: board must be geometry.size chars containing only
+        "1" and "0"
+    '''
+    return [move for move, _ in next_boards(board_to_bits(board), geometry)]
+
+def cb_one(board, geometry=TRIANGLE):
     '''
         This function solves for one possible solution and returns the set of
             moves.
@@ -101,76 +191,256 @@ def cb_one(board):
             board: The string representing the pegs on the board. This is
                 15 characters long, going from top to bottom and left to right
                 on the board as an encoded string.
+            geometry: the shape of the board
         Return Values:
-            move: the array of moves used to solve the game
-        Pre-conditions: board must be 15 char string containing only "1" and
-        "0"
+            move: the array of moves used to solve the game, empty when the
+            board already has one peg, or None when it can not be solved
+        Pre-conditions: board must be geometry.size chars containing only
+        "1" and "0"
     '''
-    possible_moves = get_moves(board)
-
-    for move in possible_moves:
-        new_board = list(board)
-        new_board[move[0]] = '0'
-        new_board[move[1]] = '0'
-        new_board[move[2]] = '1'
+    bits = board_to_bits(board)
+    if geometry is TRIANGLE and DATABASE is not None:
+        return lookup_one(DATABASE, bits, geometry)
+    return solve_one(bits, geometry)
 
-        peg_count = 0
-        for char in new_board:
-            if char == '1':
-                peg_count += 1
-        if peg_count == 1:
-            return [move]
-        else:
-            next_move = cb_one(new_board)
-            if next_move is not None:
-                return [move] + next_move
+def solve_one(bits, geometry=TRIANGLE):
+    '''
+        This function is the bitboard search behind cb_one.
+        Arguments:
+            bits: the bitboard
+            geometry: the shape of the board
+        Return Values:
+            moves: the list of moves that leaves one peg, [] if bits already
+            has one peg, or None
+        Pre-conditions: None
+    '''
+    if bits.bit_count() == 1:
+        return []
+    for move, new_bits in next_boards(bits, geometry):
+        if is_solvable(new_bits, geometry):
+            return [move] + solve_one(new_bits, geometry)
+    return None
 
-def cb_all(board):
+def cb_all(board, geometry=TRIANGLE):
     '''
         This is the outside function to solve for all solutions.
         Arguments:
             board: The string representing the pegs on the board. This is
                 15 characters long, going from top to bottom and left to right
                 on the board as an encoded string.
+            geometry: the shape of the board
         Return Values:
-            all_solutions: Set of all solutions found
-        Pre-conditions: board must be 15 char string containing only "1" and
-        "0"
+            all_solutions: list of every solution, each the full list of
+            moves that leaves one peg, in the order cb_solutions gives them
+        Pre-conditions: board must be geometry.size chars containing only
+        "1" and "0"
     '''
-    all_solutions = []
-    cb_all_check(board, all_solutions)
-    return all_solutions
+    return list(cb_solutions(board, geometry))
 
-def cb_all_check(board, solutions):
+def cb_solutions(board, geometry=TRIANGLE):
     '''
-        This is the inside recursive function to solve for all solutions.
+        This function gives every solution of the board one at a time, so
+        they can be looked through without holding them all in memory.
         Arguments:
-            board: The string representing the pegs on the board. This is
-                15 characters long, going from top to bottom and left to right
-                on the board as an encoded string.
-            solutions: an array of current moves to be added.
-        Return Values:
-            all_solutions: Set of all solutions found
-        Pre-conditions: board must be 15 char string containing only "1" and
-        "0"
-    '''
-    possible_moves = get_moves(board)
-
-    for move in possible_moves:
-        new_board = list(board)
-        new_board[move[0]] = '0'
-        new_board[move[1]] = '0'
-        new_board[move[2]] = '1'
-
-        peg_count = 0
-        for char in new_board:
-            if char == '1':
-                peg_count += 1
-        if peg_count == 1:
-            solutions.append([move])
-            return
+            board: The string representing the pegs on the board.
+            geometry: the shape of the board
+        Return Values:
+            yields each solution as the full list of moves that leaves one
+            peg, taking the moves in sorted order; a board that already has
+            one peg gives one empty solution
+        Pre-conditions: board must contain only "1" and "0"
+    '''
+    bits = board_to_bits(board)
+    if is_solvable(bits, geometry):
+        yield from solutions_from(bits, [], geometry)
+
+def solutions_from(bits, moves, geometry=TRIANGLE):
+    '''
+        This is the inside recursive generator behind cb_solutions. Only
+        moves to boards that can still be solved are followed, so every
+        branch it goes down ends in at least one solution.
+        Arguments:
+            bits: the bitboard, which must be solvable
+            moves: the moves made so far, extended and shrunk in place
+            geometry: the shape of the board
+        Return Values:
+            yields a copy of moves plus the rest of each solution
+        Pre-conditions: is_solvable(bits, geometry)
+    '''
+    if bits.bit_count() == 1:
+        yield list(moves)
+        return
+    for move, new_bits in next_boards(bits, geometry):
+        if is_solvable(new_bits, geometry):
+            moves.append(move)
+            yield from solutions_from(new_bits, moves, geometry)
+            moves.pop()
+
+def cb_count(board, geometry=TRIANGLE):
+    '''
+        This function counts the solutions of the board without making
+        them. The boards reachable from it form a graph where many move
+        orders lead to the same board, so the number of solutions from each
+        board is remembered and added up instead of walking every path. A
+        board and its rotations and mirror images have the same number.
+        Arguments:
+            board: The string representing the pegs on the board.
+            geometry: the shape of the board
+        Return Values:
+            count: the number of solutions cb_solutions would give
+        Pre-conditions: board must contain only "1" and "0"
+    '''
+    return count_from(board_to_bits(board), geometry)
+
+def count_from(bits, geometry=TRIANGLE):
+    '''
+        This is the inside recursive function behind cb_count.
+    '''
+    if bits.bit_count() == 1:
+        return 1
+    key = canonical_board(bits, geometry)
+    count = geometry.solution_counts.get(key)
+    if count is None:
+        count = sum([count_from(new_bits, geometry)
+                     for _, new_bits in next_boards(bits, geometry)])
+        geometry.solution_counts[key] = count
+    return count
+
+def solve_task(name, bits, count):
+    '''
+        This function is one task of solve_starts: it finds the first
+        solution of a bitboard and, if asked, counts all of them. It is run
+        in a worker process, so the geometry is passed by name and its
+        tables are filled in the worker.
+        Arguments:
+            name: the name of the geometry
+            bits: the bitboard
+            count: True to count the solutions
+        Return Values:
+            solution: the first solution, [] if bits has one peg, or None
+            number: the number of solutions, or None when not counted
+            seconds: how long the task took
+        Pre-conditions: None
+    '''
+    geometry = get_geometry(name)
+    started = time.perf_counter()
+    solution = solve_one(bits, geometry)
+    number = count_from(bits, geometry) if count else None
+    return solution, number, time.perf_counter() - started
+
+def solve_starts(geometry=TRIANGLE, workers=None, split="start", count=True):
+    '''
+        This function solves every start with one empty hole on a pool of
+        worker processes. With split "start" there is one task per start.
+        With split "subtree" there is one task per first move of each
+        start, which spreads the work more evenly, and the tasks of a start
+        are merged: the counts are added up and the first solution is the
+        one from the first move that has any, which is what cb_one gives.
+        Each worker has its own tables, so boards that come up in several
+        tasks are solved once per worker.
+        Arguments:
+            geometry: the shape of the board
+            workers: number of processes, every CPU if None; 1 solves in
+                this process
+            split: "start" or "subtree"
+            count: True to count the solutions of each start as well
+        Return Values:
+            rows: list with a dict for each start hole, in hole order, with
+            the keys hole, solutions (None if not counted), first (the first
+            solution or None), seconds (the total of its task times) and
+            tasks (list of (first move or None, solutions, seconds))
+        Pre-conditions: split must be "start" or "subtree"
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    tasks = []
+    for hole in range(geometry.size):
+        bits = board_to_bits(start_board(geometry, hole))
+        if split == "subtree":
+            tasks.extend([(hole, move, new_bits)
+                          for move, new_bits in next_boards(bits, geometry)])
         else:
-            next_move = cb_all_check(new_board, solutions)
-            if next_move is not None:
-                return [move] + next_move
+            tasks.append((hole, None, bits))
+
+    args = ([geometry.name] * len(tasks), [bits for _, _, bits in tasks],
+            [count] * len(tasks))
+    if workers <= 1:
+        results = list(map(solve_task, *args))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(solve_task, *args))
+
+    rows = [{"hole": hole, "solutions": 0 if count else None, "first": None,
+             "seconds": 0.0, "tasks": []} for hole in range(geometry.size)]
+    for (hole, move, _), (solution, number, seconds) in zip(tasks, results):
+        row = rows[hole]
+        if count:
+            row["solutions"] += number
+        if row["first"] is None and solution is not None:
+            row["first"] = solution if move is None else [move] + solution
+        row["seconds"] += seconds
+        row["tasks"].append((move, number, seconds))
+    return rows
+
+def format_moves(moves):
+    '''
+        This function writes a list of moves as text, or "-" for None.
+    '''
+    if moves is None:
+        return "-"
+    return " ".join(["(" + ",".join(map(str, move)) + ")" for move in moves])
+
+def main(argv):
+    '''
+        This function reads the command line options, solves every start of
+        the board and prints the table.
+        Arguments:
+            argv: list of command line arguments
+        Return Values:
+            None
+        Pre-conditions: None
+    '''
+    parser = argparse.ArgumentParser(
+        description="Solve every start with one empty hole of a peg "
+                    "solitaire board.")
+    parser.add_argument("--board", default="triangle",
+                        help="triangle, triangleN (N holes along each "
+                             "edge), english or european")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of processes, 0 for one per CPU")
+    parser.add_argument("--split", choices=("start", "subtree"),
+                        default="start",
+                        help="one task per start, or one per first move of "
+                             "each start")
+    parser.add_argument("--no-count", action="store_true",
+                        help="only find the first solutions; counting takes "
+                             "too long on the cross boards")
+    parser.add_argument("--tasks", action="store_true",
+                        help="also print the time of every task")
+    args = parser.parse_args(argv)
+    try:
+        geometry = get_geometry(args.board)
+    except ValueError as error:
+        parser.error(str(error))
+
+    started = time.perf_counter()
+    rows = solve_starts(geometry, args.workers or None, args.split,
+                        not args.no_count)
+    wall = time.perf_counter() - started
+    print("hole     solutions   seconds  first solution")
+    for row in rows:
+        solutions = "-" if row["solutions"] is None else row["solutions"]
+        print(format(row["hole"], "4") + "  " + format(solutions, ">12") +
+              "  " + format(row["seconds"], "8.3f") + "  " +
+              format_moves(row["first"]))
+        if args.tasks:
+            for move, number, seconds in row["tasks"]:
+                print("      " + format("-" if number is None else number,
+                                        ">12") + "  " +
+                      format(seconds, "8.3f") + "  task " +
+                      format_moves(None if move is None else [move]))
+    print("wall time " + format(wall, ".3f") + "s, total task time " +
+          format(sum([row["seconds"] for row in rows]), ".3f") + "s")
 
+if __name__ == "__main__":
+    main(sys.argv[1:])
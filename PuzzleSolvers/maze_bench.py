@@ -0,0 +1,281 @@
+""" ---------------------------------------------------------------------------
+    File: maze_bench.py
+    Author: Kyle Walker
+    Purpose: This program benchmarks maze_solver.py on generated mazes so
+             that changes to the solver can be compared over time. Mazes are
+             made by a seeded generator in three kinds: perfect mazes (one
+             path between any two cells), mazes with loops (a perfect maze
+             with extra walls knocked out), and open rooms (big empty rooms
+             joined by doorways). For every maze the parse, tree build, solve
+             (once per search mode) and render steps are timed separately,
+             and the peak memory of each step is measured with tracemalloc.
+             One line of JSON per maze is added to the results file, tagged
+             with the git version of the solver, so runs from different
+             versions can be compared for regressions.
+
+    Usage:
+        python maze_bench.py --sizes 100 1000 10000 --out bench.jsonl
+        python maze_bench.py --generate rooms 1000 --seed 3 > rooms.txt
+
+        Sizes are the width and height of the maze in characters. The
+        default sizes take a few minutes to run. Measuring memory with
+        tracemalloc slows every step down, and --no-memory turns it off.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from maze_solver import MazeTreeNode, SOLVERS, create_tree, load_maze, \
+    solution_lines, write_lines
+from puzzle_tools import git_version
+
+KINDS = ("perfect", "loops", "rooms")
+DEFAULT_SIZES = (100, 1000)
+# Part of the walls between rooms knocked out of a perfect maze for the
+# "loops" kind, and the size of each room for the "rooms" kind.
+LOOP_FRACTION = 0.05
+ROOM_SIZE = 40
+
+def generate_maze(kind, size, seed):
+    '''
+        This function makes a maze in the maze_solver.py file format with
+        the start near the top left and the end near the bottom right.
+        Arguments:
+            kind: one of KINDS
+            size: width and height of the maze in characters, at least 5
+            seed: seed for the random number generator
+        Return Values: the maze file contents as bytes
+        Pre-conditions: None
+    '''
+    rng = random.Random(seed)
+    width = size if size % 2 else size - 1
+    if kind == "rooms":
+        grid = rooms_grid(width, rng)
+    else:
+        grid = perfect_grid(width, rng)
+        if kind == "loops":
+            knock_out_walls(grid, width, rng)
+    stride = width + 1
+    grid[stride + 1] = ord("S")
+    grid[(width - 2) * stride + width - 2] = ord("E")
+    return bytes(grid)
+
+def perfect_grid(width, rng):
+    '''
+        This function carves a perfect maze with an iterative depth first
+        search (the recursive backtracker). Rooms sit at the odd
+        coordinates and the walls between them are opened as it goes.
+        Arguments:
+            width: odd width and height of the maze in characters
+            rng: random.Random to draw from
+        Return Values: grid: bytearray of the maze, rows ending in newlines
+        Pre-conditions: None
+    '''
+    stride = width + 1
+    grid = bytearray((b" " * width + b"\n") * width)
+    rooms = (width - 1) // 2
+    visited = bytearray(rooms * rooms)
+    visited[0] = 1
+    grid[stride + 1] = ord("#")
+    stack = [0]
+    while stack:
+        room = stack[-1]
+        room_x = room % rooms
+        room_y = room // rooms
+        options = []
+        if room_x > 0 and not visited[room - 1]:
+            options.append(room - 1)
+        if room_x < rooms - 1 and not visited[room + 1]:
+            options.append(room + 1)
+        if room_y > 0 and not visited[room - rooms]:
+            options.append(room - rooms)
+        if room_y < rooms - 1 and not visited[room + rooms]:
+            options.append(room + rooms)
+        if not options:
+            stack.pop()
+            continue
+        nxt = options[rng.randrange(len(options))]
+        visited[nxt] = 1
+        cur_x = 2 * room_x + 1
+        cur_y = 2 * room_y + 1
+        next_x = 2 * (nxt % rooms) + 1
+        next_y = 2 * (nxt // rooms) + 1
+        grid[(cur_y + next_y) // 2 * stride + (cur_x + next_x) // 2] = \
+            ord("#")
+        grid[next_y * stride + next_x] = ord("#")
+        stack.append(nxt)
+    return grid
+
+def knock_out_walls(grid, width, rng):
+    '''
+        This function opens random walls between neighboring rooms of a
+        perfect maze, which adds loops to it.
+        Arguments:
+            grid: bytearray from perfect_grid, changed in place
+            width: odd width and height of the maze in characters
+            rng: random.Random to draw from
+        Return Values: None
+        Pre-conditions: None
+    '''
+    stride = width + 1
+    rooms = (width - 1) // 2
+    for _ in range(int(rooms * rooms * LOOP_FRACTION)):
+        x = rng.randrange(1, width - 1)
+        y = rng.randrange(1, width - 1)
+        if (x + y) % 2:
+            grid[y * stride + x] = ord("#")
+
+def rooms_grid(width, rng):
+    '''
+        This function makes a grid of large open rooms. Every room has one
+        doorway in its right wall and one in its bottom wall, so all the
+        rooms are joined and there are many routes between them.
+        Arguments:
+            width: width and height of the maze in characters
+            rng: random.Random to draw from
+        Return Values: grid: bytearray of the maze, rows ending in newlines
+        Pre-conditions: None
+    '''
+    stride = width + 1
+    wall_row = b" " * width + b"\n"
+    room_row = ((b" " + b"#" * (ROOM_SIZE - 1)) *
+                (width // ROOM_SIZE + 1))[:width - 1] + b" \n"
+    grid = bytearray(b"".join([wall_row if y % ROOM_SIZE == 0 or
+                               y == width - 1 else room_row
+                               for y in range(width)]))
+    for top in range(0, width - 1, ROOM_SIZE):
+        for left in range(0, width - 1, ROOM_SIZE):
+            right = left + ROOM_SIZE
+            bottom = top + ROOM_SIZE
+            if right < width - 1:
+                door_y = rng.randrange(top + 1, min(bottom, width - 1))
+                grid[door_y * stride + right] = ord("#")
+            if bottom < width - 1:
+                door_x = rng.randrange(left + 1, min(right, width - 1))
+                grid[bottom * stride + door_x] = ord("#")
+    return grid
+
+def timed(record, phase, trace, func, *args):
+    '''
+        This function runs one step of the benchmark and records how long it
+        took and, when tracing, the most memory it used on top of what was
+        already allocated.
+        Arguments:
+            record: dict the results are added to
+            phase: name of the step, used as the start of the keys
+            trace: True if tracemalloc is running
+            func: the function to run, followed by its arguments
+        Return Values: whatever func returns
+        Pre-conditions: None
+    '''
+    if trace:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    result = func(*args)
+    record[phase + "_time"] = time.perf_counter() - started
+    if trace:
+        record[phase + "_peak"] = tracemalloc.get_traced_memory()[1] - base
+    return result
+
+def build_tree(cells, start_coord):
+    '''
+        This function builds the dumpTree tree for a maze and returns its
+        root node.
+    '''
+    root = MazeTreeNode(start_coord)
+    create_tree(root, cells, root)
+    return root
+
+def bench_maze(file_name, modes, tree_limit, trace):
+    '''
+        This function times every step of solving one maze file.
+        Arguments:
+            file_name: the name of the maze file
+            modes: names of the solvers in SOLVERS to time
+            tree_limit: the tree is only built for mazes with at most this
+            many path cells, since it needs an object for every cell
+            trace: True if tracemalloc is running
+        Return Values: record: dict of the results
+        Pre-conditions: the maze must have a START and an END
+    '''
+    record = {}
+    cells, start_coord, end_coord, maze_data = timed(
+        record, "parse", trace, load_maze, file_name)
+    record["cells"] = len(cells)
+    if record["cells"] <= tree_limit:
+        timed(record, "build", trace, build_tree, cells, start_coord)
+    end_path = None
+    for mode in modes:
+        stats = {}
+        end_path = timed(record, "solve_" + mode, trace, SOLVERS[mode],
+                         cells, start_coord, end_coord, stats)
+        record["expanded_" + mode] = stats["expanded"]
+    record["path_length"] = None if end_path is None else len(end_path)
+    if end_path is not None:
+        with open(os.devnull, "w") as sink:
+            timed(record, "render", trace, write_lines,
+                  solution_lines(maze_data, end_path), sink)
+    return record
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark maze_solver.py on generated mazes.")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=KINDS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[1])
+    parser.add_argument("--modes", nargs="+", choices=sorted(SOLVERS),
+                        default=sorted(SOLVERS))
+    parser.add_argument("--tree-limit", type=int, default=100000,
+                        help="largest number of path cells to build the "
+                             "dumpTree tree for")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="do not measure memory with tracemalloc")
+    parser.add_argument("--out", default="maze_bench.jsonl",
+                        help="file the JSON lines are added to")
+    parser.add_argument("--generate", nargs=2, metavar=("KIND", "SIZE"),
+                        help="print one generated maze and stop")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="seed used with --generate")
+    args = parser.parse_args()
+    if args.generate:
+        kind, size = args.generate
+        if kind not in KINDS:
+            parser.error("KIND must be one of " + ", ".join(KINDS))
+        sys.stdout.buffer.write(generate_maze(kind, int(size), args.seed))
+        return
+
+    trace = not args.no_memory
+    version = git_version()
+    with tempfile.TemporaryDirectory() as work_dir, \
+         open(args.out, "a") as out:
+        for kind in args.kinds:
+            for size in args.sizes:
+                for seed in args.seeds:
+                    file_name = os.path.join(work_dir, "maze.txt")
+                    started = time.perf_counter()
+                    with open(file_name, "wb") as file:
+                        file.write(generate_maze(kind, size, seed))
+                    generate_time = time.perf_counter() - started
+                    if trace:
+                        tracemalloc.start()
+                    record = {"version": version, "kind": kind,
+                              "size": size, "seed": seed,
+                              "generate_time": generate_time}
+                    record.update(bench_maze(file_name, args.modes,
+                                             args.tree_limit, trace))
+                    if trace:
+                        tracemalloc.stop()
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    print(kind + " " + str(size) + " seed " + str(seed) +
+                          ": parse " + format(record["parse_time"], ".3f") +
+                          "s, path " + str(record["path_length"]))
+
+if __name__ == "__main__":
+    main()
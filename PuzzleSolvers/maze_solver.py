@@ -2,11 +2,14 @@
     File: maze_solver.py
     Author: Kyle Walker
     Purpose: This program takes an input file of a maze that must include
-             exactly one Start and one End point, as well as not having any
-             looping paths. The maze paths are represented with hash symbols,
-             and the program uses a custom tree class to recursively traverse
-             each possible path until the correct solution is found. There are
-             multiple commands whihc give different information on the maze.
+             exactly one Start and one End point. The maze paths are
+             represented with hash symbols, and the solution is found with an
+             iterative A* search (or a breadth first search) over the path
+             cells, so mazes with looping paths and very long corridors can
+             be solved without running into the recursion limit. A custom
+             tree class is still used to show every path from the start for
+             the dumpTree command. There are multiple commands which give
+             different information on the maze.
              dumpCells shows all of the cells, or coordinates that represent
              path areas in sorted order. dumpTree prints the tree created in
              up, down, left, right order with indentations representing paths.
@@ -14,6 +17,18 @@
              exit point. dumpSize gives the max width and height of the maze.
              Lastly, an empty line will print the maze with the correct path
              shown as period characters connecting the start and end points.
+             The search used can be picked with --mode (astar, bfs,
+             bidirectional, jps or corridor), and --stats prints how many
+             nodes it expanded so the searches can be compared.
+             Running the program with --batch and a list of directories or
+             glob patterns instead solves every maze found across a pool of
+             processes, printing one line of JSON per maze with its path
+             length, timings and whether it is valid. With --serve and a
+             maze file the maze is loaded once, and then "solve sx sy ex ey",
+             dumpSize and dumpCells queries are answered one per line.
+             --distance-field saves the distance from the END to every cell
+             as a binary file that can be memory mapped (see
+             read_distance_field).
 
     Format:
         Input maze file must follow format, where S = start, E = end, and # = wall:
@@ -27,6 +42,38 @@
                 #    E#####
 
 """
+import argparse
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from collections import deque
+from functools import lru_cache, partial
+from multiprocessing import Pool
+
+from puzzle_tools import expand_paths
+
+# Bytes that may appear in a maze file, and a pattern for any other byte.
+# UTF-8 continuation bytes are left out of the pattern so a multi-byte
+# character is only reported once.
+MAZE_CHARS = b"# SE\r\n"
+INVALID_CHARS = re.compile(rb"[^# SE\r\n\x80-\xbf]")
+# Translation table turning path bytes into b"1" and everything else into
+# b"0", so a whole maze buffer can be read as one binary number.
+PATH_BITS = bytes([49 if char in b"#SE" else 48 for char in range(256)])
+NONZERO_BYTES = re.compile(rb"[^\x00]+")
+# Header of a distance field file: a magic tag, then the grid width and
+# height and the x and y of the source cell. The distances follow as one
+# little-endian 32 bit int per grid cell, -1 where the source can't be
+# reached, so the file can be memory mapped and indexed as y * width + x.
+DIST_MAGIC = b"MAZEDIST"
+DIST_HEADER = struct.Struct("<8s4i")
 
 class MazeTreeNode:
     """ This class represents the Nodes used in the 4 - directional tree.
@@ -47,122 +94,514 @@ class MazeTreeNode:
         self._left = None
         self._right = None
 
-def main():
-    file = None
+class MazeGrid:
+    """ This class stores the path cells of a maze as a bitset with one bit
+        per position, indexed as y * width + x. A 10k by 10k maze only needs
+        about 12 megabytes this way, where a set of coordinate tuples needs
+        over 100 bytes for every path cell.
+
+        The constructor creates an empty grid of the given width and height.
+        Cells are added with add and looked up with the in operator using
+        (x, y) tuples, so the grid can be used anywhere the old set of cells
+        was. Iterating over the grid gives the path coords in sorted order.
+
+        The solvers work on flat indexes instead of tuples and use the
+        neighbors method, which lists the direction code and index of each
+        path cell next to an index in up, down, left, right order. Whole
+        grid questions (like which cells are dead ends) are answered by
+        treating the bitset as one big integer and shifting it.
+    """
+    def __init__(self, width, height, bits=None):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        if bits is None:
+            bits = bytearray((self.size + 7) // 8)
+        self._bits = bits
+
+    def __contains__(self, coords):
+        x, y = coords
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.is_open(y * self.width + x)
+        return False
+
+    def __iter__(self):
+        width = self.width
+        for x in range(width):
+            for index in range(x, self.size, width):
+                if self.is_open(index):
+                    yield (x, index // width)
+
+    def __len__(self):
+        return self.to_int().bit_count()
+
+    def copy(self):
+        return MazeGrid(self.width, self.height, bytearray(self._bits))
+
+    def add(self, coords):
+        index = self.index(coords)
+        self._bits[index >> 3] |= 1 << (index & 7)
+
+    def remove_index(self, index):
+        self._bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def indices(self):
+        return bit_indices(self._bits)
+
+    def index(self, coords):
+        return coords[1] * self.width + coords[0]
+
+    def coords(self, index):
+        return (index % self.width, index // self.width)
+
+    def is_open(self, index):
+        return self._bits[index >> 3] >> (index & 7) & 1
+
+    def neighbors(self, index):
+        bits = self._bits
+        width = self.width
+        steps = []
+        step = index - width
+        if step >= 0 and bits[step >> 3] >> (step & 7) & 1:
+            steps.append((UP, step))
+        step = index + width
+        if step < self.size and bits[step >> 3] >> (step & 7) & 1:
+            steps.append((DOWN, step))
+        x = index % width
+        step = index - 1
+        if x > 0 and bits[step >> 3] >> (step & 7) & 1:
+            steps.append((LEFT, step))
+        step = index + 1
+        if x < width - 1 and bits[step >> 3] >> (step & 7) & 1:
+            steps.append((RIGHT, step))
+        return steps
+
+    def degree(self, index):
+        return len(self.neighbors(index))
+
+    def to_int(self):
+        return int.from_bytes(self._bits, "little")
+
+    def from_int(self, value):
+        '''
+            Returns a new MazeGrid of the same shape whose bits are taken
+            from a big integer.
+        '''
+        return MazeGrid(self.width, self.height, bytearray(
+            value.to_bytes((self.size + 7) // 8, "little")))
+
+    def degree_masks(self):
+        '''
+            Returns two big integers with a bit set for every path cell with
+            at least two, and at least three, path neighbors. Every cell is
+            counted at once by shifting the whole bitset one step in each
+            direction, masking off the cells that would wrap around a row.
+        '''
+        width = self.width
+        total = self.to_int()
+        first_col = first_column_mask(width, self.height)
+        last_col = first_col << (width - 1)
+        up = total << width
+        down = total >> width
+        left = (total << 1) & ~first_col
+        right = (total >> 1) & ~last_col
+        two = (up & down) | (left & right) | ((up | down) & (left | right))
+        three = (up & down & (left | right)) | (left & right & (up | down))
+        return two & total, three & total
+
+    def max_coords(self):
+        '''
+            Returns the largest x and largest y of any path cell, working on
+            the bitset as one big integer. The rows are folded onto each
+            other in halves so the columns in use can be read off the last
+            remaining row.
+        '''
+        total = self.to_int()
+        if total == 0:
+            return 0, 0
+        max_y = (total.bit_length() - 1) // self.width
+        rows = max_y + 1
+        while rows > 1:
+            half = rows // 2
+            low_bits = (rows - half) * self.width
+            total = (total & ((1 << low_bits) - 1)) | (total >> low_bits)
+            rows -= half
+        return total.bit_length() - 1, max_y
+
+@lru_cache(maxsize=4)
+def first_column_mask(width, height):
+    '''
+        This function returns a big integer with the bit of every cell in
+        the first column of a width by height grid set. It is built by
+        doubling the pattern of one row, which takes a few steps instead
+        of a string as long as the grid, and is kept for the next call
+        since the pruning rounds of a maze all ask for the same one.
+        Arguments:
+            width: width of the grid, at least 1
+            height: height of the grid
+        Return Values: the mask as an int
+        Pre-conditions: None
+    '''
+    size = width * height
+    mask = 1
+    span = width
+    while span < size:
+        mask |= mask << span
+        span *= 2
+    return mask & ((1 << size) - 1)
+
+def bit_indices(bits):
+    '''
+        This function yields the index of every set bit in a bitset, skipping
+        whole runs of zero bytes with one regex search each.
+        Arguments:
+            bits: bytes or bytearray of the bitset, lowest bit first
+        Return Values: yields each set bit index in increasing order
+        Pre-conditions: None
+    '''
+    for run in NONZERO_BYTES.finditer(bits):
+        for pos in range(run.start(), run.end()):
+            byte = bits[pos]
+            base = pos << 3
+            while byte:
+                low = byte & -byte
+                yield base + low.bit_length() - 1
+                byte ^= low
+
+class MazeLines:
+    """ This class gives a list-like, read only view of the lines of a maze
+        file that is held in a bytes object or a memory map. Only the start
+        and end offset of each line is stored, and a line is only decoded to
+        a string when it is asked for, so a huge maze file is never split
+        into a list of strings.
+    """
+    def __init__(self, buffer, line_starts, line_ends):
+        self._buffer = buffer
+        self._starts = line_starts
+        self._ends = line_ends
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, y):
+        return self._buffer[self._starts[y]:self._ends[y]].decode(
+            "utf-8", "replace")
+
+    def __iter__(self):
+        for y in range(len(self)):
+            yield self[y]
+
+# Direction codes the solvers store for each cell to record which way it
+# was entered from its parent, so a path can be walked back from the end.
+START, UP, DOWN, LEFT, RIGHT = 5, 1, 2, 3, 4
+# The tree child attribute and coordinate step for each direction, in the
+# up, down, left, right order the tree is built and printed in.
+TREE_STEPS = (("_up", 0, -1), ("_down", 0, 1), ("_left", -1, 0),
+              ("_right", 1, 0))
+# Roughly how many characters of output are gathered before each write.
+WRITE_CHUNK = 1 << 16
+# Roughly how many bytes of a maze file are turned into grid bits at once.
+PARSE_CHUNK = 1 << 20
+# Memory --serve keeps cached direction fields in by default.
+SERVE_CACHE_BYTES = 256 << 20
+
+def main(mode="astar", show_stats=False):
+    '''
+        This function runs the interactive program: it reads the maze file
+        name and then a command from standard input.
+        Arguments:
+            mode: name of the solver in SOLVERS used to find the path
+            show_stats: if True, the number of nodes the solver expanded is
+            printed to standard error after the solution
+        Return Values: None
+        Pre-conditions: None
+    '''
+    solver = SOLVERS[mode]
+    stats = {}
+    maze = None
     try:
         file_name = input()
-        file = open(file_name, "r")
+        maze = load_maze(file_name)
     except FileNotFoundError:
         print("ERROR: Could not open file: " + file_name)
 
-    if file is not None:
+    if maze is not None:
         try:
-            cells, start_coord, end_coord, maze_data = cell_finder(file)
+            cells, start_coord, end_coord, maze_data = maze
             if start_coord is None or end_coord is None:
                 print("ERROR: Every map needs exactly one START and " \
                       "exactly one END position")
                 return
-            root = MazeTreeNode(start_coord)
-            create_tree(root, cells, root)
             command = input()
             if command == "dumpCells":
                 dump_cells(cells, start_coord, end_coord)
             elif command == "dumpTree":
+                root = MazeTreeNode(start_coord)
+                create_tree(root, cells, root)
                 print("DUMPING OUT THE TREE THAT REPRESENTS THE MAZE:")
                 print_tree(root, root, "")
             elif command == "dumpSolution":
-                end_path = [root._coords]
-                solve_maze(root, root, end_coord, end_path, maze_data, True)
+                end_path = solver(cells, start_coord, end_coord, stats)
+                if end_path is not None:
+                    dump_solution(end_path)
             elif command == "dumpSize":
                 dump_size(cells)
             elif command == "":
-                end_path = [root._coords]
-                solve_maze(root, root, end_coord, end_path, maze_data, False)
+                end_path = solver(cells, start_coord, end_coord, stats)
+                if end_path is not None:
+                    solution_maze(maze_data, end_path)
             else:
                 print("ERROR: Unrecognized command " + str(command))
+            if show_stats and "expanded" in stats:
+                sys.stdout.flush()
+                print(mode + " NODES EXPANDED: " + str(stats["expanded"]),
+                      file=sys.stderr)
         except EOFError:
             return
 
+def load_maze(file_name, messages=None):
+    '''
+        This function memory maps a maze file and parses it without reading
+        it into a list of lines, so very large generated mazes load quickly.
+        Arguments:
+            file_name: the name of the maze file
+            messages: optional list to collect error messages in, see
+            parse_maze
+        Return Values: the same cells, start_coord, end_coord and maze_data
+        values as cell_finder
+        Pre-conditions: file must exist
+    '''
+    with open(file_name, "rb") as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            buffer = b""
+    return parse_maze(buffer, messages)
+
 def cell_finder(file):
     '''
-        This function iterates through the maze file and creates an array
-        of maze information, as well as a set of coords for the paths and
-        a record of the start and end coordinates as tuples.
+        This function reads an open maze file and parses it with parse_maze.
         Arguments:
             file: the input maze file
         Return Values:
-            cells: A set of all path coordinates stored as tuples
+            cells: A MazeGrid of all path coordinates
             start_coord: A coord tuple of the start point
             end_coord: A coord tuple of the end point
-            maze_data: 2D array of maze layout
+            maze_data: MazeLines of the maze layout
         Pre-conditions: file must be found and following maze rules
     '''
-    maze_data = []
-    cells = set()
-    for line in file:
-        maze_data.append(line.strip("\n"))
-    x = 0
-    y = 0
+    return parse_maze(file.read().encode("utf-8"))
+
+def find_all(buffer, char):
+    '''
+        This function yields the offset of every copy of a byte in a buffer.
+        Arguments:
+            buffer: bytes or memory map of the maze file
+            char: the byte string to look for
+        Return Values: yields each offset in increasing order
+        Pre-conditions: None
+    '''
+    pos = buffer.find(char)
+    while pos != -1:
+        yield pos
+        pos = buffer.find(char, pos + 1)
+
+def parse_maze(buffer, messages=None):
+    '''
+        This function creates the MazeGrid of path cells for a maze file
+        held in a bytes buffer, and records the start and end coordinates.
+        Nothing here loops over single characters: lines are found with
+        bytes.find, bad characters by deleting every valid byte with
+        translate (only running a regex scan if anything is left over to
+        report), and the grid bits come from translating the buffer into
+        binary numbers a chunk of rows at a time (see grid_chunks), so only
+        one chunk is ever copied out of a memory map.
+        Any problems are printed as errors in the order they show up.
+        Arguments:
+            buffer: bytes or memory map of the maze file
+            messages: optional list that the error messages are appended
+            to instead of being printed
+        Return Values:
+            cells: A MazeGrid of all path coordinates
+            start_coord: A coord tuple of the start point
+            end_coord: A coord tuple of the end point
+            maze_data: MazeLines of the maze layout
+        Pre-conditions: None
+    '''
+    size = len(buffer)
+    line_starts = array("q")
+    line_ends = array("q")
+    stride = None
+    uniform = True
+    pos = 0
+    while pos < size:
+        line_end = buffer.find(b"\n", pos)
+        next_pos = size if line_end == -1 else line_end + 1
+        if line_end == -1:
+            line_end = size
+        elif line_end > pos and buffer[line_end - 1] == 13:
+            line_end -= 1
+        if stride is None:
+            stride = next_pos - pos
+        elif next_pos - pos != stride and next_pos != size:
+            uniform = False
+        line_starts.append(pos)
+        line_ends.append(line_end)
+        pos = next_pos
+    height = len(line_starts)
+    if height and line_ends[-1] - line_starts[-1] != \
+       line_ends[0] - line_starts[0]:
+        uniform = False
+
+    if uniform:
+        width = stride or 0
+    else:
+        width = max([end - start for start, end in
+                     zip(line_starts, line_ends)]) + 1
+    bits = bytearray((width * height + 7) // 8)
+    invalid = False
+    for first, rows in grid_chunks(buffer, line_starts, line_ends, width,
+                                   uniform):
+        invalid = invalid or bool(rows.translate(None, MAZE_CHARS))
+        value = int(rows.translate(PATH_BITS)[::-1] or b"0", 2)
+        length = (len(rows) + 7) // 8
+        bits[first >> 3:(first >> 3) + length] = value.to_bytes(length,
+                                                                 "little")
+    cells = MazeGrid(width, height, bits)
+
+    def to_coords(offset):
+        y = bisect_right(line_starts, offset) - 1
+        return (offset - line_starts[y], y)
+
+    errors = []
+    if invalid:
+        errors = [(bad.start(), "ERROR: Invalid character in the map")
+                  for bad in INVALID_CHARS.finditer(buffer)]
     start_coord = None
     end_coord = None
-    special_chars = ["#", "S", "E"]
-    for row in maze_data:
-        for x in range(len(row)):
-            if maze_data[y][x] not in special_chars and maze_data[y][x] != " ":
-                print("ERROR: Invalid character in the map")
-            if maze_data[y][x] in special_chars:
-                try:
-                    if maze_data[y][x] == "S":
-                        assert start_coord is None
-                        start_coord = tuple([x, y])
-                except AssertionError:
-                    print("ERROR: The map has more than one START position")
-                try:
-                    if maze_data[y][x] == "E":
-                        assert end_coord is None
-                        end_coord = tuple([x, y])
-                except AssertionError:
-                    print("ERROR: The map has more than one END position")
-                cell = tuple([x, y])
-                cells.add(cell)
-        y += 1
-    return cells, start_coord, end_coord, maze_data
+    for offset in find_all(buffer, b"S"):
+        if start_coord is None:
+            start_coord = to_coords(offset)
+        else:
+            errors.append((offset,
+                           "ERROR: The map has more than one START position"))
+    for offset in find_all(buffer, b"E"):
+        if end_coord is None:
+            end_coord = to_coords(offset)
+        else:
+            errors.append((offset,
+                           "ERROR: The map has more than one END position"))
+    for _, message in sorted(errors):
+        if messages is None:
+            print(message)
+        else:
+            messages.append(message)
+    return cells, start_coord, end_coord, MazeLines(buffer, line_starts,
+                                                    line_ends)
+
+def grid_chunks(buffer, line_starts, line_ends, width, uniform):
+    '''
+        This function cuts a maze buffer into chunks of whole rows laid out
+        like the grid, with every row width bytes long. Each chunk starts
+        at a multiple of 8 rows, so its bits start on a byte of the bitset.
+        When every line has the same length, the buffer is already laid out
+        like the grid (the line endings become an extra wall column) and
+        the chunks are slices of it, otherwise the lines of each chunk are
+        padded with spaces into a new buffer.
+        Arguments:
+            buffer: bytes or memory map of the maze file
+            line_starts: array of the offset of each line
+            line_ends: array of the offset after each line's last character
+            width: width of the grid, including the wall column
+            uniform: True if every line has the same length
+        Return Values: yields (index of the first cell, bytes of the chunk)
+        Pre-conditions: None
+    '''
+    height = len(line_starts)
+    step = 8 * max(1, PARSE_CHUNK // (8 * width)) if width else 1
+    for top in range(0, height, step):
+        bottom = min(top + step, height)
+        if uniform:
+            yield top * width, buffer[top * width:bottom * width]
+        else:
+            rows = bytearray(b" ") * (width * (bottom - top))
+            for y in range(top, bottom):
+                start = line_starts[y]
+                end = line_ends[y]
+                first = (y - top) * width
+                rows[first:first + end - start] = buffer[start:end]
+            yield top * width, rows
+
+def write_lines(lines, out=None):
+    '''
+        This function writes lines of output in large chunks instead of
+        calling print for every line. Lines are taken from the iterable as
+        they are needed, so a generator never has to build the whole output
+        in memory.
+        Arguments:
+            lines: iterable of strings without newlines
+            out: file to write to, stdout if None
+        Return Values: None
+        Pre-conditions: None
+    '''
+    if out is None:
+        out = sys.stdout
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line) + 1
+        if size >= WRITE_CHUNK:
+            chunk.append("")
+            out.write("\n".join(chunk))
+            chunk = []
+            size = 0
+    if chunk:
+        chunk.append("")
+        out.write("\n".join(chunk))
 
 def dump_cells(cells, start_coord, end_coord):
     '''
         This function prints the sorted set of cells.
         Arguments:
-            cells: The set of cells
+            cells: The MazeGrid of cells
             start_coord: the tuple for starting coords
             end_coord: the tuple for ending coords
         Return Values: none
         Pre-conditions: cells must not be empty, dumpCells called
     '''
-    print("DUMPING OUT ALL CELLS FROM THE MAZE:")
-    for pair in sorted(cells):
+    write_lines(cell_lines(cells, start_coord, end_coord))
+
+def cell_lines(cells, start_coord, end_coord):
+    '''
+        This function yields the lines printed by dump_cells.
+        Arguments:
+            cells: The MazeGrid of cells
+            start_coord: the tuple for starting coords
+            end_coord: the tuple for ending coords
+        Return Values: yields each line of output
+        Pre-conditions: None
+    '''
+    yield "DUMPING OUT ALL CELLS FROM THE MAZE:"
+    for pair in cells:
         if pair == start_coord:
-            print("  " + str(pair) + "    START")
+            yield "  " + str(pair) + "    START"
         elif pair == end_coord:
-            print("  " + str(pair) + "    END")
+            yield "  " + str(pair) + "    END"
         else:
-            print("  " + str(pair))
+            yield "  " + str(pair)
 
 def dump_size(cells):
     '''
         This function prints the max height and width of the maze
         based on the coordinate values rather than the file's lines
         Arguments:
-            cells: The set of cells
+            cells: The MazeGrid of cells
         Return Values: none
         Pre-conditions: cells must not be empty, dumpSize must be called
     '''
-    max_x = 0
-    max_y = 0
-    for pair in cells:
-        if pair[0] > max_x:
-            max_x = pair[0]
-        if pair[1] > max_y:
-            max_y = pair[1]
+    max_x, max_y = cells.max_coords()
     print("MAP SIZE:")
     print("  wid: " + str(max_x + 1))
     print("  hei: " + str(max_y + 1))
@@ -170,43 +609,34 @@ def dump_size(cells):
 def create_tree(root, cells, prev):
     '''
         This function creates the tree using the MazeTreeNode class.
-        It uses recursion and avoids looping to create a tree with all
-        possible paths stored through connecting nodes.
+        It keeps its own stack instead of recursing, so it works for paths
+        of any length, and visits the children in the same up, down, left,
+        right order a recursive build would. Each cell is only added to the
+        tree once, so looping paths end instead of repeating forever.
         Arguments:
             root: the root node of the tree, created before calling
-            cells: The set of cells
-            prev: the parent node, orignally passed as the root but
-            passes as each current parent during recursion
+            cells: The MazeGrid of cells
+            prev: the parent node of root, normally root itself
         Return Values: returns None if empty.
         Pre-conditions: cells must not be empty
     '''
-    if root is not None:
-        parent_coords = root._coords
-        up = tuple([parent_coords[0], parent_coords[1] - 1])
-        if up in cells:
-            root._up = MazeTreeNode(up)
-            if root._up._coords != prev._coords:
-                create_tree(root._up, cells, root)
-
-        down = tuple([parent_coords[0], parent_coords[1] + 1])
-        if down in cells:
-            root._down = MazeTreeNode(down)
-            if root._down._coords != prev._coords:
-                create_tree(root._down, cells, root)
-
-        left = tuple([parent_coords[0] - 1, parent_coords[1]])
-        if left in cells and root._left != prev:
-            root._left = MazeTreeNode(left)
-            if root._left._coords != prev._coords:
-                create_tree(root._left, cells, root)
-
-        right = tuple([parent_coords[0] + 1, parent_coords[1]])
-        if right in cells and root._right != prev:
-            root._right = MazeTreeNode(right)
-            if root._right._coords != prev._coords:
-                create_tree(root._right, cells, root)
-    else:
+    if root is None:
         return None
+    seen = {root._coords, prev._coords}
+    # each entry is a node and the index of the next direction to try
+    stack = [(root, 0)]
+    while stack:
+        node, direction = stack.pop()
+        if direction == len(TREE_STEPS):
+            continue
+        stack.append((node, direction + 1))
+        child_name, step_x, step_y = TREE_STEPS[direction]
+        coords = (node._coords[0] + step_x, node._coords[1] + step_y)
+        if coords in cells and coords not in seen:
+            seen.add(coords)
+            child = MazeTreeNode(coords)
+            setattr(node, child_name, child)
+            stack.append((child, 0))
 
 def print_tree(root, prev, indent):
     '''
@@ -216,76 +646,600 @@ def print_tree(root, prev, indent):
         the paths of traversal.
         Arguments:
             root: the root node of the tree, created before calling
-            prev: the parent node, orignally passed as the root but
-            passes as each current parent during recursion
-            indent: the number of lines added before each pair ("| ")
-            this starts as an empty string, but duplicates for each
-            recursive call.
+            prev: the parent node, orignally passed as the root
+            indent: text added before every line, normally ""
         Return Values: none
         Pre-conditions: dumpTree Called
     '''
-    if root is not None:
-        print("  " + indent + str(root._coords))
-        if root._up is not None and root._up._coords != prev._coords:
-            indent += "| "
-            print_tree(root._up, root, indent)
-            indent = indent[:-2]
-        if root._down is not None and root._down._coords != prev._coords:
-            indent += "| "
-            print_tree(root._down, root, indent)
-            indent = indent[:-2]
-        if root._left is not None and root._left._coords != prev._coords:
-            indent += "| "
-            print_tree(root._left, root, indent)
-            indent = indent[:-2]
-        if root._right is not None and root._right._coords != prev._coords:
-            indent += "| "
-            print_tree(root._right, root, indent)
-            indent = indent[:-2]
-    else:
+    write_lines(tree_lines(root, prev, indent))
+
+def tree_lines(root, prev, indent):
+    '''
+        This function yields the lines printed by print_tree, walking the
+        tree with an explicit stack. Each line is indented with one "| "
+        for every step it is away from the root, built for that line only
+        so nothing but the stack is kept between lines.
+        Arguments:
+            root: the root node of the tree
+            prev: the parent node, children at its coords are skipped
+            indent: text added before every line
+        Return Values: yields each line of output
+        Pre-conditions: None
+    '''
+    if root is None:
+        return
+    indent = "  " + indent
+    stack = [(root, prev, 0)]
+    while stack:
+        node, parent, depth = stack.pop()
+        yield indent + "| " * depth + str(node._coords)
+        for child in (node._right, node._left, node._down, node._up):
+            if child is not None and child._coords != parent._coords:
+                stack.append((child, node, depth + 1))
+
+def build_path(cells, came_from, end_index):
+    '''
+        This function walks the direction codes recorded by a search back
+        from the end point and returns the path in start to end order.
+        Arguments:
+            cells: The MazeGrid of cells
+            came_from: bytearray holding the direction code each index was
+            entered with, START for the start point and 0 if not reached
+            end_index: the grid index of the end point
+        Return Values: end_path: list of coord tuples from start to end
+        Pre-conditions: end_index must have been reached by the search
+    '''
+    width = cells.width
+    step_back = {UP: width, DOWN: -width, LEFT: 1, RIGHT: -1}
+    end_path = []
+    cur = end_index
+    while came_from[cur] != START:
+        end_path.append(cells.coords(cur))
+        cur += step_back[came_from[cur]]
+    end_path.append(cells.coords(cur))
+    end_path.reverse()
+    return end_path
+
+def bfs_solve(cells, start_coord, end_coord, stats=None):
+    '''
+        This function finds the shortest path from the start to the end
+        with a breadth first search. The queue is kept explicitly and every
+        cell is only visited once, so looping paths are fine.
+        Arguments:
+            cells: The MazeGrid of cells
+            start_coord: the tuple for starting coords
+            end_coord: the tuple for ending coords
+            stats: optional dict, "expanded" is set to the number of cells
+            taken off the queue
+        Return Values: end_path: list of coord tuples from start to end,
+        or None if the end cannot be reached.
+        Pre-conditions: start_coord and end_coord must be in cells
+    '''
+    start_index = cells.index(start_coord)
+    end_index = cells.index(end_coord)
+    came_from = bytearray(cells.size)
+    came_from[start_index] = START
+    queue = deque([start_index])
+    end_path = None
+    expanded = 0
+    while queue:
+        cur = queue.popleft()
+        expanded += 1
+        if cur == end_index:
+            end_path = build_path(cells, came_from, end_index)
+            break
+        for direction, step in cells.neighbors(cur):
+            if not came_from[step]:
+                came_from[step] = direction
+                queue.append(step)
+    if stats is not None:
+        stats["expanded"] = expanded
+    return end_path
+
+def astar_solve(cells, start_coord, end_coord, stats=None):
+    '''
+        This function finds the shortest path from the start to the end
+        with an A* search, using the Manhattan distance to the end point as
+        the heuristic. Because that heuristic never overestimates on a grid,
+        a cell is settled the first time it comes off the heap, so only the
+        direction it was entered from needs to be kept for each cell. Ties
+        are broken towards the cells furthest from the start so the search
+        heads straight for the end in open areas.
+        Arguments:
+            cells: The MazeGrid of cells
+            start_coord: the tuple for starting coords
+            end_coord: the tuple for ending coords
+            stats: optional dict, "expanded" is set to the number of cells
+            settled
+        Return Values: end_path: list of coord tuples from start to end,
+        or None if the end cannot be reached.
+        Pre-conditions: start_coord and end_coord must be in cells
+    '''
+    width = cells.width
+    end_x, end_y = end_coord
+    end_index = cells.index(end_coord)
+    came_from = bytearray(cells.size)
+    heap = [(abs(start_coord[0] - end_x) + abs(start_coord[1] - end_y),
+             0, cells.index(start_coord), START)]
+    end_path = None
+    expanded = 0
+    while heap:
+        _, neg_dist, cur, direction = heapq.heappop(heap)
+        if came_from[cur]:
+            continue
+        came_from[cur] = direction
+        expanded += 1
+        if cur == end_index:
+            end_path = build_path(cells, came_from, end_index)
+            break
+        step_dist = 1 - neg_dist
+        for direction, step in cells.neighbors(cur):
+            if not came_from[step]:
+                cost = step_dist + abs(step % width - end_x) + \
+                       abs(step // width - end_y)
+                heapq.heappush(heap, (cost, -step_dist, step, direction))
+    if stats is not None:
+        stats["expanded"] = expanded
+    return end_path
+
+def direction_field(cells, end_index):
+    '''
+        This function runs a full breadth first search out from one end
+        point. The result records, for every reachable cell, the direction
+        it was entered from, so following those directions backwards from
+        any cell with build_path walks a shortest path to the end point.
+        Arguments:
+            cells: The MazeGrid of cells
+            end_index: the grid index the search starts from
+        Return Values: field: bytearray of direction codes, START at
+        end_index and 0 for cells that cannot reach it
+        Pre-conditions: end_index must be a path cell
+    '''
+    field = bytearray(cells.size)
+    field[end_index] = START
+    queue = deque([end_index])
+    while queue:
+        cur = queue.popleft()
+        for direction, step in cells.neighbors(cur):
+            if not field[step]:
+                field[step] = direction
+                queue.append(step)
+    return field
+
+def distance_field(cells, source_index):
+    '''
+        This function finds the number of steps from one cell to every other
+        path cell with a breadth first search, one layer at a time.
+        Arguments:
+            cells: The MazeGrid of cells
+            source_index: the grid index the distances are measured from
+        Return Values: dist: array of ints with one entry per grid index,
+        -1 for walls and cells that cannot be reached
+        Pre-conditions: source_index must be a path cell
+    '''
+    dist = array("i", [-1]) * cells.size
+    dist[source_index] = 0
+    frontier = [source_index]
+    steps = 0
+    while frontier:
+        steps += 1
+        next_frontier = []
+        for cur in frontier:
+            for _, step in cells.neighbors(cur):
+                if dist[step] < 0:
+                    dist[step] = steps
+                    next_frontier.append(step)
+        frontier = next_frontier
+    return dist
+
+def write_distance_field(file_name, cells, source_coord, dist):
+    '''
+        This function saves a distance field in the DIST_HEADER format.
+        Arguments:
+            file_name: the name of the file to write
+            cells: The MazeGrid the field was computed on
+            source_coord: the tuple of the cell distances are measured from
+            dist: array of ints from distance_field
+        Return Values: None
+        Pre-conditions: None
+    '''
+    if sys.byteorder == "big":
+        dist = array("i", dist)
+        dist.byteswap()
+    with open(file_name, "wb") as file:
+        file.write(DIST_HEADER.pack(DIST_MAGIC, cells.width, cells.height,
+                                    source_coord[0], source_coord[1]))
+        dist.tofile(file)
+
+def read_distance_field(file_name):
+    '''
+        This function memory maps a file saved by write_distance_field, so
+        any cell's distance can be looked up without reading the file in.
+        The next step towards the source from a cell is whichever path
+        neighbor has a distance one smaller.
+        Arguments:
+            file_name: the name of the distance field file
+        Return Values: width, height, source_coord, and dist: a memoryview
+        of ints over the mapped file, indexed as y * width + x
+        Pre-conditions: the file must be in the DIST_HEADER format, on a
+        little-endian machine
+    '''
+    with open(file_name, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, width, height, source_x, source_y = \
+        DIST_HEADER.unpack_from(buffer)
+    if magic != DIST_MAGIC:
+        raise ValueError("not a maze distance field: " + file_name)
+    dist = memoryview(buffer)[DIST_HEADER.size:].cast("i")
+    return width, height, (source_x, source_y), dist
+
+def export_distance_field(maze_file, out_file):
+    '''
+        This function loads a maze, measures the distance from its END to
+        every path cell and saves the result with write_distance_field.
+        Arguments:
+            maze_file: the name of the maze file
+            out_file: the name of the distance field file to write
+        Return Values: None
+        Pre-conditions: None
+    '''
+    try:
+        cells, _, end_coord, _ = load_maze(maze_file)
+    except FileNotFoundError:
+        print("ERROR: Could not open file: " + maze_file)
+        return
+    if end_coord is None:
+        print("ERROR: The map needs an END position")
+        return
+    dist = distance_field(cells, cells.index(end_coord))
+    write_distance_field(out_file, cells, end_coord, dist)
+    print("DISTANCE FIELD:")
+    print("  reachable: " + str(cells.size - dist.count(-1)))
+    print("  farthest: " + str(max(dist)))
+
+def bidirectional_solve(cells, start_coord, end_coord, stats=None):
+    '''
+        This function finds the shortest path with two breadth first
+        searches, one from each end, that grow one whole layer at a time
+        (always the smaller frontier) until they touch. Each search only has
+        to go about half as deep, which in open rooms means far fewer cells.
+        A cell is checked against the other search as soon as it is found,
+        so the first place they meet is on a shortest path.
+        Arguments:
+            cells: The MazeGrid of cells
+            start_coord: the tuple for starting coords
+            end_coord: the tuple for ending coords
+            stats: optional dict, "expanded" is set to the number of cells
+            expanded by both searches together
+        Return Values: end_path: list of coord tuples from start to end,
+        or None if the end cannot be reached.
+        Pre-conditions: start_coord and end_coord must be in cells
+    '''
+    start_index = cells.index(start_coord)
+    end_index = cells.index(end_coord)
+    forward = bytearray(cells.size)
+    backward = bytearray(cells.size)
+    forward[start_index] = START
+    backward[end_index] = START
+    searches = [(forward, backward), (backward, forward)]
+    frontiers = [[start_index], [end_index]]
+    meet = start_index if start_index == end_index else None
+    expanded = 0
+    while meet is None and frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        came_from, other = searches[side]
+        next_frontier = []
+        for cur in frontiers[side]:
+            expanded += 1
+            for direction, step in cells.neighbors(cur):
+                if not came_from[step]:
+                    came_from[step] = direction
+                    if other[step]:
+                        meet = step
+                        break
+                    next_frontier.append(step)
+            if meet is not None:
+                break
+        frontiers[side] = next_frontier
+    if stats is not None:
+        stats["expanded"] = expanded
+    if meet is None:
         return None
+    end_path = build_path(cells, forward, meet)
+    back_path = build_path(cells, backward, meet)
+    back_path.reverse()
+    return end_path + back_path[1:]
 
-def solve_maze(root, prev, end_coord, end_path, maze_data, is_print):
+def jps_solve(cells, start_coord, end_coord, stats=None):
     '''
-        This function finds the path from the start to end of the maze
-        and either prints the path when specified, or calls the
-        solution_maze function to print a solved diagram of the maze.
+        This function finds the shortest path with Jump Point Search, an A*
+        search that skips over the many equally short paths through open
+        areas. Moving up or down scans sideways at every step, while moving
+        sideways only goes straight ahead, so the search only stops (and
+        adds a node) at the end point, where a wall beside a sideways move
+        ends and opens up a new way, or on an up/down move where a sideways
+        scan found such a point. Only those jump points go on the heap, and
+        the straight lines between them are filled back in at the end.
         Arguments:
-            root: the root node of the tree, created before calling
-            prev: the parent node, orignally passed as the root but
-            end_coord: the tuple of the end point coordinate
-            end_path: an array that records each path, so that when the end
-            is found it will be stored here.
-            maze_data: 2D array of maze layout
-            is_print: Boolean used only to determine if the solution will be
-            printed as a list of coordinates or a graph of the solved maze.
-        Return Values: returns None if empty.
-        Pre-conditions: dumpSolution called
+            cells: The MazeGrid of cells
+            start_coord: the tuple for starting coords
+            end_coord: the tuple for ending coords
+            stats: optional dict, "expanded" is set to the number of jump
+            points settled
+        Return Values: end_path: list of coord tuples from start to end,
+        or None if the end cannot be reached.
+        Pre-conditions: start_coord and end_coord must be in cells
     '''
-    if root is not None:
-        if root._coords == end_coord:
-            if is_print is True:
-                print("PATH OF THE SOLUTION:")
-                for pair in end_path:
-                    print("  " + str(pair))
+    width = cells.width
+    height = cells.height
+    end_x, end_y = end_coord
+
+    def is_open(x, y):
+        return 0 <= x < width and 0 <= y < height and \
+            cells.is_open(y * width + x)
+
+    def jump_x(x, y, step_x):
+        while True:
+            x += step_x
+            if not is_open(x, y):
+                return None
+            if (x == end_x and y == end_y) or \
+               (is_open(x, y - 1) and not is_open(x - step_x, y - 1)) or \
+               (is_open(x, y + 1) and not is_open(x - step_x, y + 1)):
+                return (x, y)
+
+    def jump_y(x, y, step_y):
+        while True:
+            y += step_y
+            if not is_open(x, y):
+                return None
+            if (x == end_x and y == end_y) or \
+               jump_x(x, y, 1) is not None or jump_x(x, y, -1) is not None:
+                return (x, y)
+
+    parents = {start_coord: None}
+    dist = {start_coord: 0}
+    closed = set()
+    heap = [(abs(start_coord[0] - end_x) + abs(start_coord[1] - end_y),
+             0, start_coord)]
+    expanded = 0
+    while heap:
+        _, neg_dist, node = heapq.heappop(heap)
+        if node in closed:
+            continue
+        closed.add(node)
+        expanded += 1
+        if node == end_coord:
+            break
+        x, y = node
+        parent = parents[node]
+        if parent is None:
+            steps = ((0, -1), (0, 1), (-1, 0), (1, 0))
+        elif parent[1] == y:
+            step_x = 1 if x > parent[0] else -1
+            steps = [(step_x, 0)]
+            if is_open(x, y - 1) and not is_open(x - step_x, y - 1):
+                steps.append((0, -1))
+            if is_open(x, y + 1) and not is_open(x - step_x, y + 1):
+                steps.append((0, 1))
+        else:
+            steps = ((0, 1 if y > parent[1] else -1), (-1, 0), (1, 0))
+        for step_x, step_y in steps:
+            if step_x:
+                point = jump_x(x, y, step_x)
             else:
-                solution_maze(maze_data, end_path)
-
-            return end_path
-        if root._up is not None and root._up._coords != prev._coords:
-            solve_maze(root._up, root, end_coord, end_path +
-                       [root._up._coords], maze_data, is_print)
-        if root._down is not None and root._down._coords != prev._coords:
-            solve_maze(root._down, root, end_coord, end_path +
-                       [root._down._coords], maze_data, is_print)
-        if root._left is not None and root._left._coords != prev._coords:
-            solve_maze(root._left, root, end_coord, end_path +
-                       [root._left._coords], maze_data, is_print)
-        if root._right is not None and root._right._coords != prev._coords:
-            solve_maze(root._right, root, end_coord, end_path +
-                       [root._right._coords], maze_data, is_print)
-    else:
-        return
+                point = jump_y(x, y, step_y)
+            if point is None or point in closed:
+                continue
+            point_dist = -neg_dist + abs(point[0] - x) + abs(point[1] - y)
+            if point not in dist or point_dist < dist[point]:
+                dist[point] = point_dist
+                parents[point] = node
+                cost = point_dist + abs(point[0] - end_x) + \
+                       abs(point[1] - end_y)
+                heapq.heappush(heap, (cost, -point_dist, point))
+    if stats is not None:
+        stats["expanded"] = expanded
+    if end_coord not in closed:
+        return None
+
+    points = []
+    node = end_coord
+    while node is not None:
+        points.append(node)
+        node = parents[node]
+    points.reverse()
+    end_path = [start_coord]
+    for (x, y), (next_x, next_y) in zip(points, points[1:]):
+        step_x = (next_x > x) - (next_x < x)
+        step_y = (next_y > y) - (next_y < y)
+        while (x, y) != (next_x, next_y):
+            x += step_x
+            y += step_y
+            end_path.append((x, y))
+    return end_path
+
+def prune_dead_ends(cells, keep):
+    '''
+        This function fills in every dead end of the maze. Any cell with
+        one or no path neighbors is removed, which can turn the cell before
+        it into a new dead end. While there are lots of dead ends, all of
+        them are removed for the whole grid at once with degree_masks. Once
+        a round removes fewer than about 1 in 256 cells, that is slower than
+        handling cells one at a time, so the rest of each dead end branch is
+        filled in from a stack instead.
+        Arguments:
+            cells: The MazeGrid of cells
+            keep: set of indexes that must never be removed (start and end)
+        Return Values: pruned: a new MazeGrid without the dead ends
+        Pre-conditions: None
+    '''
+    keep_mask = sum([1 << index for index in keep])
+    pruned = cells
+    while True:
+        total = pruned.to_int()
+        two, _ = pruned.degree_masks()
+        dead = total & ~two & ~keep_mask
+        if dead.bit_count() <= cells.size >> 8:
+            break
+        pruned = pruned.from_int(total & ~dead)
+    stack = list(pruned.from_int(dead).indices())
+    pruned = pruned.copy()
+    while stack:
+        index = stack.pop()
+        if not pruned.is_open(index):
+            continue
+        pruned.remove_index(index)
+        for _, step in pruned.neighbors(index):
+            if step not in keep and pruned.degree(step) <= 1:
+                stack.append(step)
+    return pruned
+
+def corridor_mask(cells, keep):
+    '''
+        This function marks the plain corridor cells of the maze, which are
+        the cells with exactly two path neighbors that are not kept.
+        Arguments:
+            cells: The MazeGrid of cells
+            keep: set of indexes that always count as junctions
+        Return Values: a MazeGrid of the corridor cells
+        Pre-conditions: None
+    '''
+    keep_mask = sum([1 << index for index in keep])
+    two, three = cells.degree_masks()
+    return cells.from_int(two & ~three & ~keep_mask)
+
+def walk_corridor(cells, corridors, node, step, path=None):
+    '''
+        This function follows a corridor from a junction until it reaches
+        the next junction, which is any path cell that is not a corridor.
+        Arguments:
+            cells: The MazeGrid of cells
+            corridors: MazeGrid of the corridor cells from corridor_mask
+            node: the index of the junction the corridor starts at
+            step: the index of the first cell of the corridor
+            path: optional list that each visited index is appended to
+        Return Values: the index of the junction at the other end and the
+        number of steps taken to reach it
+        Pre-conditions: step must be a path neighbor of node
+    '''
+    prev = node
+    cur = step
+    length = 1
+    while True:
+        if path is not None:
+            path.append(cur)
+        if not corridors.is_open(cur):
+            return cur, length
+        (_, first), (_, second) = cells.neighbors(cur)
+        prev, cur = cur, second if first == prev else first
+        length += 1
+
+def build_corridor_graph(cells, corridors, start_index):
+    '''
+        This function collapses the corridors reachable from the start into
+        weighted edges between junctions. Each edge stores the junction at
+        the other end, the corridor length, and the first cell of the
+        corridor so the edge can be walked again later to get its cells.
+        Arguments:
+            cells: The MazeGrid of cells, normally with dead ends pruned
+            corridors: MazeGrid of the corridor cells from corridor_mask
+            start_index: the grid index of the start point
+        Return Values: graph: dict of junction index to a list of
+        (other junction, length, first step) edges
+        Pre-conditions: start_index must be a path cell
+    '''
+    graph = {}
+    stack = [start_index]
+    while stack:
+        node = stack.pop()
+        if node in graph:
+            continue
+        edges = []
+        graph[node] = edges
+        for _, step in cells.neighbors(node):
+            other, length = walk_corridor(cells, corridors, node, step)
+            edges.append((other, length, step))
+            if other not in graph:
+                stack.append(other)
+    return graph
+
+def corridor_solve(cells, start_coord, end_coord, stats=None):
+    '''
+        This function finds the shortest path from the start to the end by
+        pruning the dead ends, collapsing the corridors into a junction
+        graph, and running Dijkstra's algorithm on that much smaller graph.
+        The corridors on the chosen route are walked again at the end to
+        expand the route back into every coordinate along the path.
+        Arguments:
+            cells: The MazeGrid of cells
+            start_coord: the tuple for starting coords
+            end_coord: the tuple for ending coords
+            stats: optional dict, "expanded" is set to the number of
+            junctions settled
+        Return Values: end_path: list of coord tuples from start to end,
+        or None if the end cannot be reached.
+        Pre-conditions: start_coord and end_coord must be in cells
+    '''
+    start_index = cells.index(start_coord)
+    end_index = cells.index(end_coord)
+    keep = {start_index, end_index}
+    pruned = prune_dead_ends(cells, keep)
+    corridors = corridor_mask(pruned, keep)
+    graph = build_corridor_graph(pruned, corridors, start_index)
+    dist = {start_index: 0}
+    parents = {start_index: None}
+    heap = [(0, start_index)]
+    expanded = 0
+    while heap:
+        cur_dist, node = heapq.heappop(heap)
+        if cur_dist > dist[node]:
+            continue
+        expanded += 1
+        if node == end_index:
+            break
+        for other, length, step in graph[node]:
+            other_dist = cur_dist + length
+            if other not in dist or other_dist < dist[other]:
+                dist[other] = other_dist
+                parents[other] = (node, step)
+                heapq.heappush(heap, (other_dist, other))
+    if stats is not None:
+        stats["expanded"] = expanded
+    if end_index not in parents:
+        return None
+
+    legs = []
+    node = end_index
+    while parents[node] is not None:
+        legs.append(parents[node])
+        node = parents[node][0]
+    path = [start_index]
+    for node, step in reversed(legs):
+        walk_corridor(pruned, corridors, node, step, path)
+    return [cells.coords(index) for index in path]
+
+def dump_solution(end_path):
+    '''
+        This function prints the coordinates of the solution path.
+        Arguments:
+            end_path: list of coord tuples from start to end
+        Return Values: None
+        Pre-conditions: dumpSolution called
+    '''
+    write_lines(path_lines(end_path))
+
+def path_lines(end_path):
+    '''
+        This function yields the lines printed by dump_solution.
+        Arguments:
+            end_path: list of coord tuples from start to end
+        Return Values: yields each line of output
+        Pre-conditions: None
+    '''
+    yield "PATH OF THE SOLUTION:"
+    for pair in end_path:
+        yield "  " + str(pair)
 
 def solution_maze(maze_data, end_path):
     '''
@@ -294,28 +1248,222 @@ def solution_maze(maze_data, end_path):
         Arguments:
             end_path: an array that records each path, so that when the end
             is found it will be stored here.
-            maze_data: 2D array of maze layout
+            maze_data: MazeLines of the maze layout
         Return Values: None
         Pre-conditions: empty line called as command.
     '''
-    y = 0
-    new_maze = []
-    for row in maze_data:
-        temp_row = []
-        for x in range(len(row)):
-            cur_coords = tuple([x, y])
-            cur_char = maze_data[y][x]
-            if cur_coords in end_path and cur_char != "S" \
-               and cur_char != "E":
-                temp_row.append(".")
-            else:
-                temp_row.append(cur_char)
-        new_maze.append(temp_row)
-        y += 1
-    print("SOLUTION:")
-    for line in new_maze:
-        row_contents = ""
-        for char in line:
-            row_contents += char
-        print(str(row_contents))
-main()
\ No newline at end of file
+    write_lines(solution_lines(maze_data, end_path))
+
+def solution_lines(maze_data, end_path):
+    '''
+        This function yields the lines printed by solution_maze. The path
+        cells are first sorted into buckets by row, so rows the path does
+        not cross are passed through untouched and the rest only change
+        the characters that are on the path.
+        Arguments:
+            maze_data: MazeLines of the maze layout
+            end_path: list of coord tuples from start to end
+        Return Values: yields each line of output
+        Pre-conditions: None
+    '''
+    path_rows = {}
+    for x, y in end_path:
+        path_rows.setdefault(y, []).append(x)
+    yield "SOLUTION:"
+    for y, row in enumerate(maze_data):
+        if y not in path_rows:
+            yield row
+            continue
+        chars = list(row)
+        for x in path_rows[y]:
+            if x < len(chars) and chars[x] != "S" and chars[x] != "E":
+                chars[x] = "."
+        yield "".join(chars)
+
+def solve_file(file_name, mode="astar"):
+    '''
+        This function loads and solves one maze file for batch mode and
+        reports the result instead of printing it. A maze is valid when it
+        loads without any errors and the end can be reached from the start.
+        Arguments:
+            file_name: the name of the maze file
+            mode: name of the solver in SOLVERS to use
+        Return Values: dict with the file name, whether it is valid, the
+        number of cells on the solution path (or None), the solver used and
+        how many nodes it expanded, the load and solve times in seconds,
+        and any error messages
+        Pre-conditions: None
+    '''
+    result = {"file": file_name, "valid": False, "path_length": None,
+              "mode": mode, "nodes_expanded": None, "load_time": 0.0,
+              "solve_time": 0.0, "errors": []}
+    messages = result["errors"]
+    started = time.perf_counter()
+    try:
+        cells, start_coord, end_coord, _ = load_maze(file_name, messages)
+    except OSError:
+        messages.append("ERROR: Could not open file: " + file_name)
+        return result
+    loaded = time.perf_counter()
+    result["load_time"] = loaded - started
+    if start_coord is None or end_coord is None:
+        messages.append("ERROR: Every map needs exactly one START and "
+                        "exactly one END position")
+        return result
+    stats = {}
+    end_path = SOLVERS[mode](cells, start_coord, end_coord, stats)
+    result["solve_time"] = time.perf_counter() - loaded
+    result["nodes_expanded"] = stats["expanded"]
+    if end_path is None:
+        messages.append("ERROR: The END position cannot be reached")
+    else:
+        result["path_length"] = len(end_path)
+    result["valid"] = end_path is not None and not messages
+    return result
+
+def batch_solve(patterns, workers=None, out=None, mode="astar"):
+    '''
+        This function solves many maze files across a pool of worker
+        processes and writes one line of JSON per maze, in file order.
+        Arguments:
+            patterns: list of directory names, file names or glob patterns
+            workers: number of worker processes, all cores if None
+            out: file to write the JSON lines to, stdout if None
+            mode: name of the solver in SOLVERS to use
+        Return Values: None
+        Pre-conditions: None
+    '''
+    if out is None:
+        out = sys.stdout
+    file_names = expand_paths(patterns)
+    if not file_names:
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # small chunks keep the workers busy when a few mazes are much larger
+    chunk = max(1, len(file_names) // (workers * 16))
+    with Pool(workers) as pool:
+        for result in pool.imap(partial(solve_file, mode=mode),
+                                file_names, chunk):
+            out.write(json.dumps(result) + "\n")
+
+def serve(file_name, cache_size=None, lines=None):
+    '''
+        This function loads one maze and then answers queries about it, one
+        per line, until the input ends. The queries are "solve sx sy ex ey",
+        which prints the shortest path between two cells in the same format
+        as dumpSolution, and "dumpSize" and "dumpCells". The direction field
+        of each end point is kept in an LRU cache, so asking for another
+        path to a recent end point only walks the path instead of searching.
+        Each field takes one byte per position of the grid (100 megabytes
+        for a 10k by 10k maze), so by default only as many are kept as fit
+        in SERVE_CACHE_BYTES, and at most 16.
+        Arguments:
+            file_name: the name of the maze file
+            cache_size: how many direction fields to keep, or None to fit
+            them in SERVE_CACHE_BYTES
+            lines: iterable of query lines, stdin if None
+        Return Values: None
+        Pre-conditions: None
+    '''
+    if lines is None:
+        lines = sys.stdin
+    try:
+        cells, start_coord, end_coord, _ = load_maze(file_name)
+    except FileNotFoundError:
+        print("ERROR: Could not open file: " + file_name)
+        return
+    if cache_size is None:
+        cache_size = max(1, min(16, SERVE_CACHE_BYTES // max(1, cells.size)))
+    field_for = lru_cache(maxsize=cache_size)(partial(direction_field, cells))
+    for line in lines:
+        words = line.split()
+        if not words:
+            continue
+        if words == ["dumpSize"]:
+            dump_size(cells)
+        elif words == ["dumpCells"]:
+            dump_cells(cells, start_coord, end_coord)
+        elif words[0] == "solve" and len(words) == 5:
+            try:
+                source = (int(words[1]), int(words[2]))
+                target = (int(words[3]), int(words[4]))
+            except ValueError:
+                print("ERROR: Coordinates must be whole numbers")
+                continue
+            if source not in cells or target not in cells:
+                print("ERROR: Both points must be path cells")
+                continue
+            field = field_for(cells.index(target))
+            if not field[cells.index(source)]:
+                print("ERROR: No path from " + str(source) + " to " +
+                      str(target))
+                continue
+            end_path = build_path(cells, field, cells.index(source))
+            end_path.reverse()
+            dump_solution(end_path)
+        else:
+            print("ERROR: Unrecognized command " + line.strip())
+        sys.stdout.flush()
+
+# The solvers that can be picked with --mode. Each one takes the cells, the
+# start and end coords, and an optional stats dict, and returns the path.
+SOLVERS = {"astar": astar_solve, "bfs": bfs_solve,
+           "bidirectional": bidirectional_solve, "jps": jps_solve,
+           "corridor": corridor_solve}
+
+def run(argv):
+    '''
+        This function reads the command line options and either starts the
+        usual interactive program or solves a batch of mazes.
+        Arguments:
+            argv: list of command line arguments
+        Return Values: None
+        Pre-conditions: None
+    '''
+    parser = argparse.ArgumentParser(
+        description="Solve a maze. With no options the maze file name and "
+                    "a command are read from standard input.")
+    parser.add_argument("--batch", nargs="+", metavar="PATH",
+                        help="solve every maze in these directories, files "
+                             "or glob patterns and print JSON lines")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes used by --batch")
+    parser.add_argument("--serve", metavar="FILE",
+                        help="load this maze once and answer queries read "
+                             "from standard input")
+    parser.add_argument("--cache", type=int, default=None,
+                        help="number of end points --serve keeps searches "
+                             "cached for, each taking one byte per position "
+                             "of the maze; by default as many as fit in " +
+                             str(SERVE_CACHE_BYTES >> 20) + " MB, at most "
+                             "16")
+    parser.add_argument("--distance-field", nargs=2,
+                        metavar=("MAZE", "OUT"),
+                        help="save the distance from the END of MAZE to "
+                             "every cell as a binary file OUT")
+    parser.add_argument("--mode", choices=sorted(SOLVERS),
+                        help="search used to solve the maze (astar by "
+                             "default); not used by --serve or "
+                             "--distance-field")
+    parser.add_argument("--stats", action="store_true",
+                        help="print how many nodes the search expanded; "
+                             "only for the interactive program")
+    args = parser.parse_args(argv)
+    if args.mode and (args.serve or args.distance_field):
+        parser.error("--mode can't be used with --serve or --distance-field")
+    if args.stats and (args.batch or args.serve or args.distance_field):
+        parser.error("--stats can only be used with the interactive program")
+    if args.mode is None:
+        args.mode = "astar"
+    if args.batch:
+        batch_solve(args.batch, args.workers, mode=args.mode)
+    elif args.serve:
+        serve(args.serve, args.cache)
+    elif args.distance_field:
+        export_distance_field(*args.distance_field)
+    else:
+        main(args.mode, args.stats)
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,48 @@
+""" ---------------------------------------------------------------------------
+    File: puzzle_tools.py
+    Author: Kyle Walker
+    Purpose: This module holds the small helpers shared by the puzzle
+             solvers and their benchmarks: turning the --batch arguments of
+             maze_solver.py and word_search.py into a list of files, and
+             tagging benchmark results with the git version of the code.
+
+"""
+import glob
+import os
+import subprocess
+
+def expand_paths(patterns):
+    '''
+        This function turns batch mode arguments into a sorted list of
+        files. A directory gives every file inside it, and anything else is
+        treated as a glob pattern.
+        Arguments:
+            patterns: list of directory names, file names or glob patterns
+        Return Values: file_names: list of file names, sorted within each
+        pattern
+        Pre-conditions: None
+    '''
+    file_names = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name)
+                       for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern)
+        file_names.extend(sorted([name for name in matches
+                                  if os.path.isfile(name)]))
+    return file_names
+
+def git_version():
+    '''
+        This function returns the output of git describe for the checkout
+        these programs are run from, or None when they are not in a git
+        checkout.
+    '''
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
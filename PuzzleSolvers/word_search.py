@@ -7,7 +7,11 @@
             characters surrounding it in every direction, then iterate through
             the grid in each of the eight directions searching for the word.
             If the word is found, it's location will be recorded on the output
-            grid.
+            grid. All the words are searched for together: they are built
+            into one Aho-Corasick automaton, and every row, column and
+            diagonal of the grid is read through it once. Other programs
+            can call find_words(grid, words), which returns a list of Match
+            objects instead of printing.
     Course: CSC 120, spring 2021
     Format:
         Input txt file must match following format, where words are arranged in grid and word to find are listed below after a space:
@@ -24,17 +28,57 @@
                 two
                 words
 '''
+import argparse
+import json
 import os
+import sys
+import time
 import copy
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 
-def main():
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from puzzle_tools import expand_paths
+
+# Row and column steps for the eight search directions, in the order the
+# search tries them: right, left, up, down, up-left, down-right, up-right,
+# down-left.
+DIRECTIONS = ((0, 1), (0, -1), (-1, 0), (1, 0),
+              (-1, -1), (1, 1), (-1, 1), (1, -1))
+# Used to pad out short rows and the sheared rows of the diagonals. Words
+# never contain it, so it can never be part of a match.
+PAD = "\n"
+# Up to this many words are looked up one by one with str.find over the
+# line index; longer word lists go through the Aho-Corasick automaton,
+# which reads the grid once no matter how many words there are.
+FIND_WORD_LIMIT = 64
+# Matches any one letter of the grid in a word, when wildcards are on.
+WILDCARD = "?"
+# A line holding just this separates the puzzles of a batch file.
+PUZZLE_DELIMITER = "---"
+# Names of the DIRECTIONS, as given in each Match.
+DIRECTION_NAMES = ("right", "left", "up", "down",
+                   "up-left", "down-right", "up-right", "down-left")
+DIRECTION_STEPS = dict(zip(DIRECTION_NAMES, DIRECTIONS))
+# The grid being searched by parallel_search, rebuilt once in each worker
+# process from the shared memory block by attach_grid.
+worker_grid = None
+
+def main(per_word=False, workers=1, engine=None, mismatches=0,
+         wildcards=False):
     try:
         print("Please give the puzzle filename:")
         file_name = input()
         file = open(file_name, "r")
     except FileNotFoundError:
         print("Sorry, the file doesn't exist or cannot be opened.")
-        os._exit(0)
+        return
 
     grid = []
     word_list = []
@@ -50,8 +94,9 @@ def main():
         elif grid_section is False:
             word_list.append(str(line))
 
-    answer_key = []
-    char_check(grid, word_list, answer_key)
+    matches = find_words(grid, word_list, engine, workers, mismatches,
+                         wildcards)
+    report_matches(grid, word_list, matches, per_word)
 
 
 def char_check(grid, word_list, answer_key):
@@ -177,4 +222,823 @@ def word_plotter(grid, word_list, answer_key, current_word):
             print()
             break
 
-main()
\ No newline at end of file
+def grid_lines(grid):
+    '''
+        This function yields every row, column, diagonal and anti-diagonal
+        of the grid as one string, read in the right, down, down-right and
+        down-left directions. Read backwards, the same strings cover the
+        other four directions. The columns and diagonals are cut out with
+        zip, after shifting each row sideways by its row number for the
+        diagonals, so no string is built one character at a time. Padding
+        characters fill the gaps and are never part of a word.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        Return Values: yields (line, row, col, step_row, step_col) where
+        character i of line is at grid[row + i * step_row][col + i * step_col]
+        Pre-conditions: None
+    '''
+    height = len(grid)
+    width = max([len(row) for row in grid], default=0)
+    rows = ["".join(row) + PAD * (width - len(row)) for row in grid]
+    for y in range(height):
+        yield rows[y], y, 0, 0, 1
+    for x, column in enumerate(zip(*rows)):
+        yield "".join(column), 0, x, 1, 0
+    # row y shifted right by (height - 1 - y) puts every cell with the same
+    # col - row in one column; shifted right by y, the same row + col
+    sheared = [PAD * (height - 1 - y) + rows[y] + PAD * y
+               for y in range(height)]
+    for k, diagonal in enumerate(zip(*sheared)):
+        yield "".join(diagonal), 0, k - height + 1, 1, 1
+    sheared = [PAD * y + rows[y] + PAD * (height - 1 - y)
+               for y in range(height)]
+    for k, diagonal in enumerate(zip(*sheared)):
+        yield "".join(diagonal), 0, k, 1, -1
+
+def build_automaton(patterns):
+    '''
+        This function builds an Aho-Corasick automaton: a trie of all the
+        patterns, plus a failure link for each trie node pointing at the
+        longest suffix of it that is also in the trie, so one pass over a
+        string finds every pattern in it.
+        Arguments: patterns = list of strings to search for.
+        Return Values: goto = list of dicts of the trie edges of each node.
+        fail = list of the failure link of each node.
+        out = list of the pattern numbers that end at each node, including
+        the ones reached through failure links.
+        Pre-conditions: None
+    '''
+    goto = [{}]
+    out = [[]]
+    for number, pattern in enumerate(patterns):
+        if not pattern:
+            continue
+        state = 0
+        for char in pattern:
+            nxt = goto[state].get(char)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][char] = nxt
+                goto.append({})
+                out.append([])
+            state = nxt
+        out[state].append(number)
+
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, nxt in goto[state].items():
+            queue.append(nxt)
+            link = fail[state]
+            while link and char not in goto[link]:
+                link = fail[link]
+            fail[nxt] = goto[link].get(char, 0)
+            if out[fail[nxt]]:
+                out[nxt] = out[nxt] + out[fail[nxt]]
+    return goto, fail, out
+
+def aho_corasick_search(grid, word_list):
+    '''
+        This function finds every word of the word list in the grid at once.
+        The automaton is built from each word and each word reversed, and
+        each of the row, column and diagonal lines is scanned a single time:
+        a reversed word found in a line is the word itself going the other
+        way, so the four scans cover all eight directions.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        word_list = list of the words to be searched for.
+        Return Values: matches = sorted list of (word number, row, col,
+        direction) tuples, where direction is the index in DIRECTIONS of the
+        way the word reads from its first letter at (row, col).
+        Pre-conditions: None
+    '''
+    patterns = []
+    for word in word_list:
+        patterns.append(word)
+        patterns.append(word[::-1])
+    goto, fail, out = build_automaton(patterns)
+
+    matches = []
+    for line, row, col, step_row, step_col in grid_lines(grid):
+        forward = DIRECTIONS.index((step_row, step_col))
+        backward = DIRECTIONS.index((-step_row, -step_col))
+        state = 0
+        for pos, char in enumerate(line):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for number in out[state]:
+                word_number = number // 2
+                length = len(word_list[word_number])
+                # one letter words would match in every direction, so
+                # they are only taken from the rows, read forwards
+                if length == 1 and (number % 2 or step_row):
+                    continue
+                if number % 2 == 0:
+                    first = pos - length + 1
+                    direction = forward
+                else:
+                    first = pos
+                    direction = backward
+                matches.append((word_number, row + first * step_row,
+                                col + first * step_col, direction))
+    matches.sort()
+    return matches
+
+class LineIndex:
+    '''
+        Every line of the grid in all eight directions, i.e. each row, column
+        and diagonal read forwards and backwards, joined by PAD into one
+        string so a word can be looked up with str.find. starts holds the
+        offset of each line in text and origins the (row, col, direction) of
+        its first character, so a match maps back to the grid with a bisect
+        and a multiply instead of a tuple per character. The rows read
+        forwards come first and end at offset row_end.
+    '''
+    def __init__(self, grid):
+        lines = list(grid_lines(grid))
+        self.starts = []
+        self.origins = []
+        self.row_end = sum([len(line[0]) + 1 for line in lines[:len(grid)]])
+        parts = []
+        offset = 0
+        for backwards in (False, True):
+            for line, row, col, step_row, step_col in lines:
+                if backwards:
+                    last = len(line) - 1
+                    line = line[::-1]
+                    row += last * step_row
+                    col += last * step_col
+                    step_row, step_col = -step_row, -step_col
+                self.starts.append(offset)
+                self.origins.append(
+                    (row, col, DIRECTIONS.index((step_row, step_col))))
+                parts.append(line)
+                offset += len(line) + 1
+        self.text = PAD.join(parts)
+
+    def find(self, word):
+        '''
+            This method yields (row, col, direction) for every place the
+            word starts in the grid. One letter words are only looked for in
+            the rows read forwards, so each cell matches once.
+        '''
+        if not word:
+            return
+        text = self.text
+        end = self.row_end if len(word) == 1 else len(text)
+        pos = text.find(word, 0, end)
+        while pos != -1:
+            line = bisect_right(self.starts, pos) - 1
+            row, col, direction = self.origins[line]
+            step_row, step_col = DIRECTIONS[direction]
+            offset = pos - self.starts[line]
+            yield row + offset * step_row, col + offset * step_col, direction
+            pos = text.find(word, pos + 1, end)
+
+def find_search(grid, word_list):
+    '''
+        This function finds every word of the word list in the grid by
+        looking each one up in a LineIndex of the grid with str.find.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        word_list = list of the words to be searched for.
+        Return Values: matches = sorted list of (word number, row, col,
+        direction) tuples, as from aho_corasick_search.
+        Pre-conditions: None
+    '''
+    index = LineIndex(grid)
+    matches = []
+    for word_number, word in enumerate(word_list):
+        for row, col, direction in index.find(word):
+            matches.append((word_number, row, col, direction))
+    matches.sort()
+    return matches
+
+def numpy_search(grid, word_list):
+    '''
+        This function finds every word of the word list in the grid with
+        NumPy. The grid is loaded as one array of character codes, uint8 when
+        every character fits in a byte, and compared with each letter once.
+        For every word and direction, the masks of its first two letters
+        are combined with logical_and over views shifted by one step. That
+        leaves few enough starting cells for the rest of the letters to be
+        checked by indexing the flattened array at just those cells. There
+        is no Python loop over the cells at all, which is fastest for dense
+        grids and short words.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        word_list = list of the words to be searched for.
+        Return Values: matches = sorted list of (word number, row, col,
+        direction) tuples, as from aho_corasick_search.
+        Pre-conditions: NumPy is installed
+    '''
+    if numpy is None:
+        raise ImportError("numpy_search needs NumPy installed")
+    height = len(grid)
+    width = max([len(row) for row in grid], default=0)
+    text = "".join(["".join(row) + PAD * (width - len(row)) for row in grid])
+    codes = numpy.frombuffer(text.encode("utf-32-le"), dtype=numpy.uint32)
+    if codes.size and codes.max() < 256:
+        codes = codes.astype(numpy.uint8)
+    flat_codes = codes
+    codes = codes.reshape(height, width)
+
+    letter_masks = {}
+    matches = []
+    for word_number, word in enumerate(word_list):
+        length = len(word)
+        if length == 0:
+            continue
+        for char in word[:2]:
+            if char not in letter_masks:
+                letter_masks[char] = codes == ord(char)
+        first = letter_masks[word[0]]
+        second = letter_masks[word[1]] if length > 1 else None
+        # one letter words would match in every direction
+        for direction in range(1 if length == 1 else len(DIRECTIONS)):
+            step_row, step_col = DIRECTIONS[direction]
+            reach_row = (length - 1) * step_row
+            reach_col = (length - 1) * step_col
+            top = max(0, -reach_row)
+            bottom = height - max(0, reach_row)
+            left = max(0, -reach_col)
+            right = width - max(0, reach_col)
+            if bottom <= top or right <= left:
+                continue
+            found = first[top:bottom, left:right]
+            if second is not None:
+                found = numpy.logical_and(
+                    found, second[top + step_row:bottom + step_row,
+                                  left + step_col:right + step_col])
+            # offsets of the starting cells in the flattened grid
+            cells = numpy.flatnonzero(found)
+            span = right - left
+            cells = (cells // span + top) * width + cells % span + left
+            step = step_row * width + step_col
+            for i in range(2, length):
+                if not cells.size:
+                    break
+                cells = cells[flat_codes[cells + i * step] == ord(word[i])]
+            matches.extend([(word_number, cell // width, cell % width,
+                             direction) for cell in cells.tolist()])
+    matches.sort()
+    return matches
+
+def split_pieces(word, count, wildcard):
+    '''
+        This function picks count pieces of a word that do not overlap and
+        hold no wildcards, as long as it can make them, for fuzzy_search.
+        A word with at most count - 1 letters that differ from the grid
+        must match at least one of them exactly.
+        Arguments: word = the word to split
+        count = number of pieces
+        wildcard = the letter that matches anything, or None
+        Return Values: pieces = list of (offset in the word, piece), or
+        None when the word has fewer than count letters that are not
+        wildcards
+        Pre-conditions: count must be at least 1
+    '''
+    segments = []
+    pos = 0
+    while pos < len(word):
+        if word[pos] == wildcard:
+            pos += 1
+            continue
+        end = pos
+        while end < len(word) and word[end] != wildcard:
+            end += 1
+        segments.append((end - pos, pos))
+        pos = end
+    if sum([length for length, _ in segments]) < count:
+        return None
+    # cut the segments into count pieces in all, giving each further cut
+    # to the segment whose pieces stay the longest, and cut them evenly
+    cuts = [1] * len(segments)
+    for _ in range(count - len(segments)):
+        best = max(range(len(segments)),
+                   key=lambda i: segments[i][0] // (cuts[i] + 1))
+        cuts[best] += 1
+    pieces = []
+    for (length, offset), parts in zip(segments, cuts):
+        for part in range(parts):
+            start = offset + length * part // parts
+            end = offset + length * (part + 1) // parts
+            pieces.append((end - start, start))
+    pieces.sort(reverse=True)
+    return [(offset, word[offset:offset + length])
+            for length, offset in pieces[:count]]
+
+def piece_positions(text, pieces):
+    '''
+        This function yields every place each piece appears in the text,
+        with str.find for a few pieces and the automaton for many, as
+        search_words picks.
+        Arguments: text = the string to search
+        pieces = list of strings to search for
+        Return Values: yields (piece number, offset in the text)
+        Pre-conditions: None
+    '''
+    if len(pieces) <= FIND_WORD_LIMIT:
+        for number, piece in enumerate(pieces):
+            pos = text.find(piece)
+            while pos != -1:
+                yield number, pos
+                pos = text.find(piece, pos + 1)
+        return
+    goto, fail, out = build_automaton(pieces)
+    state = 0
+    for pos, char in enumerate(text):
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        for number in out[state]:
+            yield number, pos - len(pieces[number]) + 1
+
+def fuzzy_search(grid, word_list, mismatches=0, wildcards=True):
+    '''
+        This function finds the words in the grid allowing WILDCARD letters
+        in the words, which match any letter, and up to a number of letters
+        that differ from the grid. Each word is split into mismatches + 1
+        pieces without wildcards (see split_pieces): the mismatches can
+        spoil at most that many pieces, so wherever the word matches, at
+        least one piece is in the grid exactly. The pieces are found in
+        all eight directions at once in the text of a LineIndex, and only
+        the places they point to are checked letter by letter against the
+        whole word. Words with no more letters than mismatches, not
+        counting wildcards, match everywhere they fit and are not searched.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        word_list = list of the words to be searched for.
+        mismatches = most letters of a word that may differ from the grid.
+        wildcards = if False, WILDCARD is matched like any other letter.
+        Return Values: matches = sorted list of (word number, row, col,
+        direction) tuples, as from aho_corasick_search.
+        Pre-conditions: None
+    '''
+    index = LineIndex(grid)
+    text = index.text
+    wildcard = WILDCARD if wildcards else None
+    found = []
+    # the numbers of the words each distinct piece came from, with the
+    # offset of the piece in the word
+    piece_numbers = {}
+    owners = []
+    # (offset, length) of every stretch of the text without PAD, for the
+    # words that match everywhere they fit
+    runs = None
+    for number, word in enumerate(word_list):
+        if not word:
+            continue
+        pieces = split_pieces(word, mismatches + 1, wildcard)
+        if pieces is None:
+            if runs is None:
+                runs = []
+                first = 0
+                for run in text.split(PAD):
+                    runs.append((first, len(run)))
+                    first += len(run) + 1
+            for first, length in runs:
+                found.extend([(number, start) for start
+                              in range(first, first + length - len(word) + 1)])
+            continue
+        for offset, piece in pieces:
+            if piece not in piece_numbers:
+                piece_numbers[piece] = len(owners)
+                owners.append([])
+            owners[piece_numbers[piece]].append((number, offset))
+
+    checked = set()
+    for piece_number, pos in piece_positions(text, list(piece_numbers)):
+        for number, offset in owners[piece_number]:
+            start = pos - offset
+            if start < 0 or (number, start) in checked:
+                continue
+            checked.add((number, start))
+            word = word_list[number]
+            letters = text[start:start + len(word)]
+            if len(letters) < len(word) or PAD in letters:
+                continue
+            budget = mismatches
+            for want, got in zip(word, letters):
+                if want != got and want != wildcard:
+                    budget -= 1
+                    if budget < 0:
+                        break
+            else:
+                found.append((number, start))
+
+    matches = []
+    for number, start in found:
+        # one letter words would match in every direction
+        if len(word_list[number]) == 1 and start >= index.row_end:
+            continue
+        line = bisect_right(index.starts, start) - 1
+        row, col, direction = index.origins[line]
+        step_row, step_col = DIRECTIONS[direction]
+        offset = start - index.starts[line]
+        matches.append((number, row + offset * step_row,
+                        col + offset * step_col, direction))
+    matches.sort()
+    return matches
+
+# Search engines that can be picked by name with --engine.
+ENGINES = {"automaton": aho_corasick_search, "find": find_search,
+           "numpy": numpy_search}
+
+def search_words(grid, word_list, engine=None):
+    '''
+        This function finds every word of the word list in the grid. With
+        no engine given, it uses str.find for short word lists and the
+        automaton for long ones.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        word_list = list of the words to be searched for.
+        engine = name of the search in ENGINES to use, or None
+        Return Values: matches = sorted list of (word number, row, col,
+        direction) tuples.
+        Pre-conditions: None
+    '''
+    if engine is None:
+        engine = "find" if len(word_list) <= FIND_WORD_LIMIT else "automaton"
+    return ENGINES[engine](grid, word_list)
+
+def pack_grid(grid):
+    '''
+        This function packs the grid into one compact UTF-8 buffer, short
+        rows padded out with PAD, for passing between processes.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        Return Values: data = bytes of the rows, one after the other
+        width = number of characters in each row
+        Pre-conditions: None
+    '''
+    width = max([len(row) for row in grid], default=0)
+    data = "".join(["".join(row) + PAD * (width - len(row))
+                    for row in grid]).encode("utf-8")
+    return data, width
+
+def unpack_grid(data, width):
+    '''
+        This function turns a buffer from pack_grid back into a grid, as a
+        list of row strings, which every search accepts.
+    '''
+    text = data.decode("utf-8")
+    return [text[i:i + width] for i in range(0, len(text), width)]
+
+def attach_grid(name, size, width):
+    '''
+        This function runs once in each worker process of parallel_search.
+        It reads the grid out of the shared memory block and keeps it, as a
+        list of row strings, in worker_grid.
+        Arguments: name = name of the shared memory block
+        size = number of bytes of the grid in the block
+        width = number of characters in each row
+        Return Values: None
+        Pre-conditions: None
+    '''
+    global worker_grid
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        worker_grid = unpack_grid(bytes(memory.buf[:size]), width)
+    finally:
+        memory.close()
+
+def search_band(top, bottom, reach, word_list, engine):
+    '''
+        This function searches one band of rows of worker_grid for every
+        word of the word list. The band is searched together with reach rows
+        above and below it, so every word starting in it is found whole, and
+        only the matches whose first letter is in the band are kept.
+        Arguments: top = first row of the band
+        bottom = row after the last row of the band
+        reach = length of the longest word, less one
+        word_list = list of the words to be searched for.
+        engine = name of the search in ENGINES to use, or None
+        Return Values: matches = sorted list of (word number, row, col,
+        direction) tuples, with rows numbered as in the whole grid
+        Pre-conditions: attach_grid has run in this process
+    '''
+    low = max(0, top - reach)
+    return [(word_number, low + row, col, direction)
+            for word_number, row, col, direction
+            in search_words(worker_grid[low:bottom + reach], word_list,
+                            engine)
+            if top <= low + row < bottom]
+
+def parallel_search(grid, word_list, workers=None, engine=None):
+    '''
+        This function finds every word of the word list in the grid using a
+        pool of worker processes. The grid is split into one band of rows
+        per worker, and each worker reads all the lines of its band, so the
+        work of scanning the grid is shared out as well as the matching.
+        Bands overlap by the length of the longest word, which is extra work
+        when the words are long next to the height of the grid. Each worker
+        also builds its own index or automaton for the whole word list. The
+        grid is put in a shared memory block that every worker reads once,
+        instead of being pickled with each band. The result is the same as
+        search_words gives. More workers than CPUs only add that overhead,
+        so the number of workers is cut down to the number of CPUs, and on
+        a single CPU the search is done in this process.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        word_list = list of the words to be searched for.
+        workers = number of processes, every CPU if None
+        engine = name of the search in ENGINES to use, or None
+        Return Values: matches = sorted list of (word number, row, col,
+        direction) tuples.
+        Pre-conditions: None
+    '''
+    cpus = os.cpu_count() or 1
+    if workers is None:
+        workers = cpus
+    workers = min(workers, cpus, len(grid))
+    data, width = pack_grid(grid)
+    if workers <= 1 or not data or not word_list:
+        return search_words(grid, word_list, engine)
+
+    reach = max([len(word) for word in word_list]) - 1
+    memory = shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        memory.buf[:len(data)] = data
+        band = -(-len(grid) // workers)
+        with ProcessPoolExecutor(workers, initializer=attach_grid,
+                                 initargs=(memory.name, len(data),
+                                           width)) as pool:
+            futures = [pool.submit(search_band, top, top + band, reach,
+                                   word_list, engine)
+                       for top in range(0, len(grid), band)]
+            matches = []
+            for future in futures:
+                matches.extend(future.result())
+    finally:
+        memory.close()
+        memory.unlink()
+    matches.sort()
+    return matches
+
+class Match:
+    '''
+        One place a word was found in the grid: the word, the (row, col) of
+        its first letter, the name of the direction it reads in from there
+        (one of DIRECTION_NAMES) and its number of letters.
+    '''
+    __slots__ = ("word", "start", "direction", "length")
+
+    def __init__(self, word, start, direction, length):
+        self.word = word
+        self.start = start
+        self.direction = direction
+        self.length = length
+
+    def __eq__(self, other):
+        if not isinstance(other, Match):
+            return NotImplemented
+        return (self.word, self.start, self.direction, self.length) == \
+            (other.word, other.start, other.direction, other.length)
+
+    def __hash__(self):
+        return hash((self.word, self.start, self.direction, self.length))
+
+    def __repr__(self):
+        return "Match(%r, %r, %r, %r)" % (self.word, self.start,
+                                          self.direction, self.length)
+
+    def cells(self):
+        '''
+            This method returns the (row, col) of every letter of the match,
+            from the first letter to the last.
+        '''
+        row, col = self.start
+        step_row, step_col = DIRECTION_STEPS[self.direction]
+        return [(row + i * step_row, col + i * step_col)
+                for i in range(self.length)]
+
+def find_words(grid, words, engine=None, workers=1, mismatches=0,
+               wildcards=False):
+    '''
+        This function finds every place each word appears in the grid, in
+        all eight directions, and returns the matches without printing
+        anything. It is the way to use this module as a library.
+        Arguments: grid = the rows of the grid, as strings or lists of chars,
+        or one string with a row on each line
+        words = list of the words to be searched for
+        engine = name of the search in ENGINES to use, or None to pick one
+        by the number of words
+        workers = number of processes to search with, every CPU if None
+        mismatches = most letters of a word that may differ from the grid
+        wildcards = if True, WILDCARD in a word matches any letter
+        Return Values: matches = list of Match, in the order of the word
+        list and then by start and direction. With mismatches or wildcards
+        the search is done by fuzzy_search in this process, and engine and
+        workers are not used.
+        Pre-conditions: None
+    '''
+    if isinstance(grid, str):
+        grid = grid.splitlines()
+    if mismatches or (wildcards and
+                       any([WILDCARD in word for word in words])):
+        found = fuzzy_search(grid, words, mismatches, wildcards)
+    elif workers == 1:
+        found = search_words(grid, words, engine)
+    else:
+        found = parallel_search(grid, words, workers, engine)
+    return [Match(words[word_number], (row, col), DIRECTION_NAMES[direction],
+                  len(words[word_number]))
+            for word_number, row, col, direction in found]
+
+def read_puzzles(lines):
+    '''
+        This function reads puzzles one at a time from the lines of a batch
+        file. Each puzzle is a grid and then, after a blank line, its words,
+        in the same format as a single puzzle file. The puzzles are
+        separated by PUZZLE_DELIMITER lines. Only one puzzle is held at a
+        time.
+        Arguments: lines = iterable of lines, such as an open file
+        Return Values: yields (grid, word_list) for each puzzle, the grid as
+        a list of row strings
+        Pre-conditions: None
+    '''
+    grid = []
+    word_list = []
+    grid_section = True
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line == PUZZLE_DELIMITER:
+            if grid or word_list:
+                yield grid, word_list
+            grid = []
+            word_list = []
+            grid_section = True
+        elif line == "":
+            if grid:
+                grid_section = False
+        elif grid_section:
+            grid.append(line)
+        else:
+            word_list.append(line)
+    if grid or word_list:
+        yield grid, word_list
+
+def search_file(file_name, engine=None, mismatches=0, wildcards=False):
+    '''
+        This function solves every puzzle in one batch file for batch mode
+        and reports the results instead of printing them.
+        Arguments: file_name = the name of the batch file
+        engine = name of the search in ENGINES to use, or None
+        mismatches, wildcards = as for find_words
+        Return Values: yields a dict for each puzzle with the file name, the
+        number of the puzzle in the file, the size of the grid, every match
+        found, the words not found, the search time in seconds and any
+        errors. A file that cannot be read gives one dict with an error.
+        Pre-conditions: None
+    '''
+    try:
+        with open(file_name, "r") as file:
+            for number, (grid, word_list) in enumerate(read_puzzles(file)):
+                started = time.perf_counter()
+                matches = find_words(grid, word_list, engine,
+                                     mismatches=mismatches,
+                                     wildcards=wildcards)
+                found = set([match.word for match in matches])
+                yield {"file": file_name, "puzzle": number,
+                       "rows": len(grid),
+                       "cols": max([len(row) for row in grid], default=0),
+                       "matches": [{"word": match.word,
+                                    "row": match.start[0],
+                                    "col": match.start[1],
+                                    "direction": match.direction,
+                                    "length": match.length}
+                                   for match in matches],
+                       "not_found": [word for word in word_list
+                                     if word not in found],
+                       "search_time": time.perf_counter() - started,
+                       "errors": []}
+    except (OSError, UnicodeDecodeError):
+        yield {"file": file_name, "puzzle": None,
+               "errors": ["Sorry, the file doesn't exist or cannot be "
+                          "opened."]}
+
+def batch_search(patterns, out=None, engine=None, mismatches=0,
+                 wildcards=False):
+    '''
+        This function solves every puzzle in many batch files and writes one
+        line of JSON per puzzle as it goes, so any number of puzzles can be
+        solved in one process.
+        Arguments: patterns = list of directory names, file names or glob
+        patterns
+        out = file to write the JSON lines to, stdout if None
+        engine = name of the search in ENGINES to use, or None
+        mismatches, wildcards = as for find_words
+        Return Values: None
+        Pre-conditions: None
+    '''
+    if out is None:
+        out = sys.stdout
+    for file_name in expand_paths(patterns):
+        for result in search_file(file_name, engine, mismatches, wildcards):
+            out.write(json.dumps(result) + "\n")
+
+def match_mask(grid, matches):
+    '''
+        This function marks every cell covered by a match in one flat mask
+        of the grid, indexed row * width + col. Each match is marked with a
+        single strided slice assignment.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        matches = list of Match
+        Return Values: mask = bytearray holding 1 for every found cell
+        Pre-conditions: None
+    '''
+    width = max([len(row) for row in grid], default=0)
+    mask = bytearray(len(grid) * width)
+    for match in matches:
+        row, col = match.start
+        step_row, step_col = DIRECTION_STEPS[match.direction]
+        first = row * width + col
+        step = step_row * width + step_col
+        if step < 0:
+            first += step * (match.length - 1)
+            step = -step
+        mask[first:first + step * match.length:step] = b"\x01" * match.length
+    return mask
+
+def answer_lines(grid, mask):
+    '''
+        This function yields the rows of the answer grid, with every cell
+        that is not set in the mask replaced by a period.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        mask = bytearray from match_mask
+        Return Values: yields each row as a string
+        Pre-conditions: None
+    '''
+    width = max([len(row) for row in grid], default=0)
+    for y, row in enumerate(grid):
+        marks = mask[y * width:(y + 1) * width]
+        yield "".join([char if mark else "."
+                       for char, mark in zip(row, marks)])
+
+def report_matches(grid, word_list, matches, per_word=False):
+    '''
+        This function says which words were not found and prints the answer
+        grid: once with every found word on it, or with per_word one grid
+        for each word found, in the order of the word list.
+        Arguments: grid = 2D array of all chars in the scrambled word grid.
+        word_list = list of the words to be searched for.
+        matches = list of Match from find_words
+        per_word = if True, print a separate grid for each word
+        Return Values: None
+        Pre-conditions: None
+    '''
+    by_word = {}
+    for match in matches:
+        by_word.setdefault(match.word, []).append(match)
+    shown = set()
+    for current_word in word_list:
+        if current_word not in by_word:
+            print("Word " + "'" + current_word + "'" + " not found \n")
+        elif per_word and current_word not in shown:
+            shown.add(current_word)
+            mask = match_mask(grid, by_word[current_word])
+            print("\n".join(answer_lines(grid, mask)))
+    if matches and not per_word:
+        mask = match_mask(grid, matches)
+        print("\n".join(answer_lines(grid, mask)))
+
+def run(argv):
+    '''
+        This function reads the command line options and starts the usual
+        interactive program.
+        Arguments: argv = list of command line arguments
+        Return Values: None
+        Pre-conditions: None
+    '''
+    parser = argparse.ArgumentParser(
+        description="Solve a word search. With no --batch, the puzzle file "
+                    "name is read from standard input.")
+    parser.add_argument("--batch", nargs="+", metavar="PATH",
+                        help="solve every puzzle in these directories, files "
+                             "or glob patterns, with puzzles in a file "
+                             "separated by " + PUZZLE_DELIMITER + " lines, "
+                             "and print JSON lines")
+    parser.add_argument("--per-word", action="store_true",
+                        help="print a separate answer grid for each word "
+                             "instead of one grid with every word on it")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to search with, 0 for "
+                             "one per CPU")
+    parser.add_argument("--engine", choices=sorted(ENGINES),
+                        help="search to use; by default str.find for short "
+                             "word lists and the automaton for long ones")
+    parser.add_argument("--mismatches", type=int, default=0, metavar="K",
+                        help="also find words with up to K letters that "
+                             "differ from the grid")
+    parser.add_argument("--wildcards", action="store_true",
+                        help="let " + WILDCARD + " in a word match any "
+                             "letter")
+    args = parser.parse_args(argv)
+    if args.mismatches < 0:
+        parser.error("--mismatches must not be negative")
+    if args.engine == "numpy" and numpy is None:
+        parser.error("--engine numpy needs NumPy installed")
+    if args.batch:
+        batch_search(args.batch, engine=args.engine,
+                     mismatches=args.mismatches, wildcards=args.wildcards)
+    else:
+        main(args.per_word, args.workers or None, args.engine,
+             args.mismatches, args.wildcards)
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
@@ -0,0 +1,226 @@
+""" ---------------------------------------------------------------------------
+    File: word_search_bench.py
+    Author: Kyle Walker
+    Purpose: This program benchmarks the search engines of word_search.py
+             on generated puzzles, so speedups can be tracked over time. A
+             seeded generator makes square grids with part of a random
+             dictionary hidden in them in all eight directions. Every
+             engine is timed on each puzzle, along with the original
+             char_check search for puzzles small enough for it to finish.
+             The answer grids char_check prints are thrown away. One line of
+             JSON per puzzle is added to the results file, tagged with the
+             git version of the code. With --profile-dir, each run is also
+             done under cProfile and its stats are saved, to show where the
+             time goes inside word_search and word_plotter.
+
+    Usage:
+        python word_search_bench.py --sizes 10 100 2000 --words 10 100000
+        python word_search_bench.py --profile-dir profiles
+        python word_search_bench.py --generate 50 200 --seed 3 > puzzle.txt
+
+        Saved profiles can be read with: python -m pstats FILE
+"""
+import argparse
+import cProfile
+import contextlib
+import json
+import os
+import random
+import string
+import sys
+import time
+
+from puzzle_tools import git_version
+from word_search import DIRECTIONS, ENGINES, char_check, numpy, search_words
+
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_WORDS = (10, 1000)
+# Part of the dictionary that is hidden in the grid; the rest is random
+# words that are mostly not found.
+HIDDEN_FRACTION = 0.5
+# Shortest and longest dictionary words.
+WORD_LENGTHS = (3, 10)
+# char_check is only run when cells times words is at most this, since it
+# checks every word against every cell in Python.
+LEGACY_LIMIT = 10 ** 6
+
+def generate_puzzle(size, word_count, seed):
+    '''
+        This function makes a square word search puzzle. Random words are
+        placed in random directions wherever they fit with the letters
+        already there, and the cells left over are filled with random
+        letters.
+        Arguments:
+            size: width and height of the grid
+            word_count: number of words in the dictionary
+            seed: seed for the random number generator
+        Return Values: grid: list of rows, each a list of letters
+        word_list: list of the dictionary words
+        Pre-conditions: None
+    '''
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase
+    word_list = ["".join([rng.choice(letters) for _ in
+                          range(rng.randint(*WORD_LENGTHS))])
+                 for _ in range(word_count)]
+    grid = [[None] * size for _ in range(size)]
+    for word in word_list[:int(word_count * HIDDEN_FRACTION)]:
+        place_word(grid, word, rng)
+    for row in grid:
+        for col in range(size):
+            if row[col] is None:
+                row[col] = rng.choice(letters)
+    return grid, word_list
+
+def place_word(grid, word, rng, tries=10):
+    '''
+        This function hides one word in the grid at a random start and
+        direction where it fits, giving up after a few tries.
+        Arguments:
+            grid: list of rows, with None for empty cells, changed in place
+            word: the word to hide
+            rng: random.Random to draw from
+            tries: number of places to try
+        Return Values: True if the word was placed
+        Pre-conditions: None
+    '''
+    size = len(grid)
+    for _ in range(tries):
+        step_row, step_col = rng.choice(DIRECTIONS)
+        row = rng.randrange(size)
+        col = rng.randrange(size)
+        cells = [(row + i * step_row, col + i * step_col)
+                 for i in range(len(word))]
+        if all([0 <= y < size and 0 <= x < size and
+                grid[y][x] in (None, char)
+                for (y, x), char in zip(cells, word)]):
+            for (y, x), char in zip(cells, word):
+                grid[y][x] = char
+            return True
+    return False
+
+def puzzle_text(grid, word_list):
+    '''
+        This function writes a puzzle in the word_search.py file format.
+    '''
+    return "\n".join(["".join(row) for row in grid] + [""] + word_list) + "\n"
+
+def legacy_search(grid, word_list):
+    '''
+        This function runs the original char_check search with its printed
+        answer grids thrown away.
+    '''
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        char_check(grid, word_list, [])
+
+def timed(record, name, profile_file, func, *args):
+    '''
+        This function runs one search, adds its time in seconds to the
+        record as name_time, and returns what it returned. When a profile
+        file name is given, the run is done under cProfile and the stats are
+        saved there, which makes the time longer.
+    '''
+    profiler = cProfile.Profile() if profile_file else None
+    started = time.perf_counter()
+    if profiler:
+        result = profiler.runcall(func, *args)
+    else:
+        result = func(*args)
+    record[name + "_time"] = time.perf_counter() - started
+    if profiler:
+        profiler.dump_stats(profile_file)
+    return result
+
+def bench_puzzle(grid, word_list, engines, legacy_limit, profile_prefix):
+    '''
+        This function times every engine, and char_check when the puzzle is
+        small enough, on one puzzle.
+        Arguments:
+            grid: list of rows, each a list of letters
+            word_list: list of the dictionary words
+            engines: names of the searches in ENGINES to time
+            legacy_limit: largest cells times words to run char_check for
+            profile_prefix: start of the profile file names, or None
+        Return Values: record: dict of the results
+        Pre-conditions: None
+    '''
+    record = {}
+    counts = set()
+    for engine in engines:
+        profile_file = profile_prefix and profile_prefix + engine + ".prof"
+        matches = timed(record, engine, profile_file, search_words, grid,
+                        word_list, engine)
+        record[engine + "_matches"] = len(matches)
+        counts.add(len(matches))
+    record["engines_agree"] = len(counts) <= 1
+    if len(grid) * len(grid) * len(word_list) <= legacy_limit:
+        profile_file = profile_prefix and profile_prefix + "char_check.prof"
+        timed(record, "char_check", profile_file, legacy_search, grid,
+              word_list)
+    else:
+        record["char_check_time"] = None
+    return record
+
+def main():
+    engines = sorted([name for name in ENGINES
+                      if name != "numpy" or numpy is not None])
+    parser = argparse.ArgumentParser(
+        description="Benchmark word_search.py on generated puzzles.")
+    parser.add_argument("--sizes", nargs="+", type=int,
+                        default=DEFAULT_SIZES,
+                        help="width and height of the grids")
+    parser.add_argument("--words", nargs="+", type=int,
+                        default=DEFAULT_WORDS,
+                        help="number of words in the dictionaries")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[1])
+    parser.add_argument("--engines", nargs="+", choices=engines,
+                        default=engines)
+    parser.add_argument("--legacy-limit", type=int, default=LEGACY_LIMIT,
+                        help="largest cells times words to run the "
+                             "original char_check search for")
+    parser.add_argument("--profile-dir",
+                        help="save cProfile stats of every run here")
+    parser.add_argument("--out", default="word_search_bench.jsonl",
+                        help="file the JSON lines are added to")
+    parser.add_argument("--generate", nargs=2, type=int,
+                        metavar=("SIZE", "WORDS"),
+                        help="print one generated puzzle and stop")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="seed used with --generate")
+    args = parser.parse_args()
+    if args.generate:
+        sys.stdout.write(puzzle_text(*generate_puzzle(*args.generate,
+                                                      args.seed)))
+        return
+
+    if args.profile_dir:
+        os.makedirs(args.profile_dir, exist_ok=True)
+    version = git_version()
+    with open(args.out, "a") as out:
+        for size in args.sizes:
+            for word_count in args.words:
+                for seed in args.seeds:
+                    started = time.perf_counter()
+                    grid, word_list = generate_puzzle(size, word_count, seed)
+                    record = {"version": version, "size": size,
+                              "words": word_count, "seed": seed,
+                              "generate_time": time.perf_counter() - started}
+                    profile_prefix = None
+                    if args.profile_dir:
+                        profile_prefix = os.path.join(
+                            args.profile_dir, "%dx%d-%dw-s%d-" %
+                            (size, size, word_count, seed))
+                    record.update(bench_puzzle(grid, word_list, args.engines,
+                                               args.legacy_limit,
+                                               profile_prefix))
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    print(str(size) + "x" + str(size) + ", " +
+                          str(word_count) + " words, seed " + str(seed) +
+                          ": " + ", ".join(
+                              [engine + " " +
+                               format(record[engine + "_time"], ".3f") + "s"
+                               for engine in args.engines]))
+
+if __name__ == "__main__":
+    main()